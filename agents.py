@@ -1,18 +1,72 @@
 import os
+import threading
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
 from tools import search_eu_directive
 
-# Load environment variables
-load_dotenv()
-
-# Initialize the LLM (GPT-4o-mini for cost efficiency)
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0,  # Deterministic outputs (no creativity needed)
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+# The LLM client and the agents are built on first use, not at import:
+# langchain_openai and langgraph take over a second to import, and
+# importing this module shouldn't need an API key
+LLM_MODEL = "gpt-4o-mini"  # GPT-4o-mini for cost efficiency
+LLM_TEMPERATURE = 0.0  # Deterministic outputs (no creativity needed)
+
+_llm = None
+_agents = {}
+_lock = threading.Lock()
+
+def get_llm():
+    """
+    Lazy load the shared chat model
+    """
+    global _llm
+    
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+                
+                # Load environment variables
+                load_dotenv()
+                _llm = ChatOpenAI(
+                    model=LLM_MODEL,
+                    temperature=LLM_TEMPERATURE,
+                    api_key=os.getenv("OPENAI_API_KEY")
+                )
+    
+    return _llm
+
+def set_llm(model):
+    """
+    Use another chat model for every agent (e.g. fakes.FakeChatModel for
+    offline runs); agents already built are rebuilt on next use
+    """
+    global _llm
+    
+    with _lock:
+        _llm = model
+        _agents.clear()
+
+def llm_settings():
+    """
+    (model name, temperature) of the shared chat model, without building
+    the client (so no API key is needed)
+    """
+    model = _llm
+    if model is None:
+        return LLM_MODEL, LLM_TEMPERATURE
+    return getattr(model, "model_name", type(model).__name__), getattr(model, "temperature", "")
+
+def create_agent(model, instructions):
+    """
+    Build a ReAct agent with the directive search tool around any
+    tool-calling chat model (e.g. fakes.FakeChatModel for offline runs)
+    """
+    from langgraph.prebuilt import create_react_agent
+    
+    return create_react_agent(
+        model,
+        tools=[search_eu_directive],
+        state_modifier=instructions
+    )
 # ============================================================
 # AGENT 1: GREENWASHING ANALYZER
 # ============================================================
@@ -58,43 +112,42 @@ Output format (be concise):
 Be objective and cite the directive when relevant.
 """
 
-analyzer_agent = create_react_agent(
-    llm,
-    tools=[search_eu_directive],
-    state_modifier=analyzer_instructions
-)
 
 # ============================================================
 # AGENT 2: ARTICLE VALIDATOR
 # ============================================================
 
+# Shared by the agentic and the routed (single call) validator prompts
+# Numbers and headings as in EU_2023_Dir.pdf
+article_guide = """Article 3: Substantiation of explicit environmental claims (scientific evidence, life-cycle view, offsets kept separate)
+Article 4: Substantiation of comparative explicit environmental claims (equivalent data and methods)
+Article 5: Communication of explicit environmental claims (specific wording, future environmental performance commitments, offsets disclosure)
+Article 6: Communication of comparative environmental claims (comparison to other products/traders)
+Article 7: Environmental labels (labels must come from certified schemes)
+Article 8: Requirements for environmental labelling schemes (transparency, third-party verification)
+Article 9: Review of the substantiation of explicit environmental claims (keeping claims current)
+Article 10: Verification and certification of the substantiation and communication (independent verifier, certificate of conformity)
+Article 11: Verifier (independence and competence)
+Article 12: Small and medium sized enterprises
+"""
+
 validator_instructions = """You are a legal compliance expert specializing in EU environmental regulations.
 
 ARTICLE REFERENCE GUIDE (use this to know which articles to search for):
 
-Article 3: Substantiation of explicit environmental claims (scientific evidence required)
-Article 4: Assessment of environmental impacts (lifecycle, significant impacts)
-Article 5: Presentation of environmental claims (avoid generic terms, be specific)
-Article 6: Comparative environmental claims (comparison to other products/traders)
-Article 7: Environmental claims related to future environmental performance (commitments, monitoring)
-Article 8: Information requirements for consumers (clear, accessible information)
-Article 9: Aggregated carbon footprint information (specific to carbon footprints)
-Article 10: Environmental labelling schemes (certification, third-party verification)
-Article 11: Update of explicit environmental claims (keeping claims current)
-Article 12: Verification and conformity assessment (independent verification)
-
+""" + article_guide + """
 CRITICAL SEARCH STRATEGY - YOU MUST DO ALL THESE STEPS:
 
 Step 1: Identify claim type from the analysis
-- Future commitment (e.g., "will be neutral by 2030") → Article 7
-- Comparison (e.g., "better than X") → Article 6
-- Label/certification mention → Article 8 or 10
+- Future commitment (e.g., "will be neutral by 2030") → Article 5
+- Comparison (e.g., "better than X") → Article 4 or 6
+- Label/certification mention → Article 7, 8 or 10
 - Vague terms (e.g., "eco-friendly") → Article 5
 - Unsubstantiated → Article 3
 
 Step 2: Search for the PRIMARY article
 - Use search_eu_directive with: "Article [NUMBER] [specific topic]"
-- Example: "Article 7 future environmental performance"
+- Example: "Article 5 future environmental performance"
 
 Step 3: Search for SUBSTANTIATION requirements
 - Use search_eu_directive with: "Article 3 substantiation scientific evidence"
@@ -111,11 +164,11 @@ SEARCH FOR SPECIFIC ARTICLE NUMBERS using the guide above.
 
 Example workflow:
 User claim: "We will be carbon neutral by 2030"
-1. Identify: This is a FUTURE claim → Article 7
-2. Search: "Article 7 future environmental performance"
+1. Identify: This is a FUTURE claim → Article 5
+2. Search: "Article 5 future environmental performance"
 3. Search: "Article 3 substantiation requirements"
-4. Search: "Article 11 verification commitments"
-Result: Articles 7, 3, 11
+4. Search: "Article 3 greenhouse gas emission offsets"
+Result: Articles 5, 3
 
 Your task:
 1. READ the claim type from the analysis
@@ -139,11 +192,34 @@ If no violations found, return empty lists.
 Be precise with article numbers and cite the directive text.
 """
 
-validator_agent = create_react_agent(
-    llm,
-    tools=[search_eu_directive],
-    state_modifier=validator_instructions
-)
+
+# Routed mode: the relevant articles are fetched up front and passed in the
+# message, so the validator answers in a single call without tools
+validator_direct_instructions = """You are a legal compliance expert specializing in EU environmental regulations.
+
+ARTICLE REFERENCE GUIDE:
+
+""" + article_guide + """
+You receive the marketing text, a previous greenwashing analysis and the text
+of the directive articles most likely to apply (always including Article 3).
+
+Your task:
+1. Identify the claim type (future commitment, comparison, label, vague term, unsubstantiated)
+2. Check the claim against each provided article
+3. Report only violations supported by the provided article text
+
+Output format (a single JSON object, be concise):
+{
+  "violated_articles": ["Article X", "Article Y"],
+  "explanations": {
+    "Article X": "Brief explanation of what this article requires and how the claim violates it",
+    "Article Y": "Brief explanation..."
+  }
+}
+
+If no violations found, return empty lists.
+Be precise with article numbers and cite the directive text.
+"""
 
 # ============================================================
 # AGENT 3: COMPLIANT REWRITER
@@ -173,15 +249,38 @@ Output format (be concise):
 Make the text sound natural and professional, not overly legalistic.
 """
 
-rewriter_agent = create_react_agent(
-    llm,
-    tools=[search_eu_directive],
-    state_modifier=rewriter_instructions
-)
+
+AGENT_INSTRUCTIONS = {
+    "analyzer": analyzer_instructions,
+    "validator": validator_instructions,
+    "rewriter": rewriter_instructions,
+}
+
+def get_agent(name):
+    """
+    Lazy load one of the agents ("analyzer", "validator" or "rewriter")
+    Each is built once and shared by every workflow run
+    """
+    agent = _agents.get(name)
+    if agent is None:
+        model = get_llm()
+        with _lock:
+            agent = _agents.get(name)
+            if agent is None:
+                agent = _agents[name] = create_agent(model, AGENT_INSTRUCTIONS[name])
+    return agent
+
+def __getattr__(name):
+    # Keeps `from agents import llm, analyzer_agent` working, built on first access
+    if name == "llm":
+        return get_llm()
+    if name.endswith("_agent") and name[:-len("_agent")] in AGENT_INSTRUCTIONS:
+        return get_agent(name[:-len("_agent")])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # EXPORT ALL AGENTS
 # Make agents available for import
-__all__ = ['analyzer_agent', 'validator_agent', 'rewriter_agent']
+__all__ = ['get_llm', 'set_llm', 'llm_settings', 'get_agent', 'analyzer_agent', 'validator_agent', 'rewriter_agent']
 
 # Optional: Test function to verify agents work
 if __name__ == "__main__":
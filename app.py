@@ -3,8 +3,6 @@ Streamlit UI for Greenwashing Detection System
 """
 
 import streamlit as st
-from graph import analyze_greenwashing
-import json
 
 # Page configuration
 st.set_page_config(
@@ -13,6 +11,24 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource(show_spinner="📂 Loading the EU directive and the agents...")
+def load_pipeline():
+    """
+    Import the workflow and build the agents and vector store once per
+    server process; Streamlit re-runs this script on every interaction
+    and every session gets the cached objects
+    """
+    from agents import AGENT_INSTRUCTIONS, get_agent
+    from graph import get_app, stream_greenwashing
+    from tools import warmup
+    
+    warmup()
+    for name in AGENT_INSTRUCTIONS:
+        get_agent(name)
+    get_app()
+    
+    return stream_greenwashing
+
 # Title and description
 st.title("🌱 Greenwashing Detection System")
 st.markdown("""
@@ -22,6 +38,14 @@ This AI-powered system analyzes marketing claims for greenwashing using:
 - **LangGraph** for workflow orchestration
 """)
 
+# Preload on the first page render, so the first analysis doesn't pay for
+# the index and model load (cached, so later re-runs return immediately).
+# A failure is shown here; the Analyze button retries the load.
+try:
+    load_pipeline()
+except Exception as e:
+    st.error(f"❌ Error loading the EU directive and the agents: {str(e)}")
+
 st.divider()
 # Input section
 st.subheader("📝 Enter Marketing Text")
@@ -46,122 +70,142 @@ if clear_button:
     st.rerun()
 
 st.divider()
-# Main analysis logic
-if analyze_button:
-    if not input_text.strip():
-        st.warning("⚠️ Please enter some text to analyze.")
+
+# Result columns, filled in section by section
+def render_analysis(analysis):
+    st.subheader("🔍 Analysis")
+    
+    # Display greenwashing status
+    if analysis.get('is_greenwashing'):
+        st.error("**Status:** Greenwashing Detected")
     else:
-        # Show loading spinner
-        with st.spinner("🤖 AI Agents are analyzing... This may take 30-60 seconds..."):
-            try:
-                # Call the workflow
-                result = analyze_greenwashing(input_text)
-                
-                # Store in session state so it persists
-                st.session_state['result'] = result
-                st.session_state['analyzed'] = True
-                
-            except Exception as e:
-                st.error(f"❌ Error during analysis: {str(e)}")
-                st.error("Please check your API key and try again.")
-                st.session_state['analyzed'] = False
-# Display results if analysis was performed
-if st.session_state.get('analyzed', False):
-    result = st.session_state.get('result', {})
+        st.success("**Status:** No Greenwashing Detected")
     
-    st.success("✅ Analysis Complete!")
+    # Display confidence
+    confidence = analysis.get('confidence', 0)
+    st.metric("Confidence", f"{confidence}%")
     
-    # Create three columns for results
-    col1, col2, col3 = st.columns(3)
+    # Display reasoning
+    st.markdown("**Reasoning:**")
+    st.info(analysis.get('reasoning') or 'No reasoning provided')
     
-    # Column 1: Analysis
-    with col1:
-        st.subheader("🔍 Analysis")
-        
-        # Parse the analysis (it's a JSON string)
-        try:
-            analysis = json.loads(result.get('analysis', '{}'))
-            
-            # Display greenwashing status
-            if analysis.get('is_greenwashing'):
-                st.error("**Status:** Greenwashing Detected")
-            else:
-                st.success("**Status:** No Greenwashing Detected")
-            
-            # Display confidence
-            confidence = analysis.get('confidence', 0)
-            st.metric("Confidence", f"{confidence}%")
-            
-            # Display reasoning
-            st.markdown("**Reasoning:**")
-            st.info(analysis.get('reasoning', 'No reasoning provided'))
-            
-            # Display flagged phrases
-            flagged = analysis.get('flagged_phrases', [])
-            if flagged:
-                st.markdown("**Flagged Phrases:**")
-                for phrase in flagged:
-                    st.markdown(f"- `{phrase}`")
-        
-        except json.JSONDecodeError:
-            # If parsing fails, show raw text
-            st.write(result.get('analysis', 'No analysis available'))
+    # Display flagged phrases
+    flagged = analysis.get('flagged_phrases', [])
+    if flagged:
+        st.markdown("**Flagged Phrases:**")
+        for phrase in flagged:
+            st.markdown(f"- `{phrase}`")
+
+def render_violations(violations):
+    st.subheader("📋 Violations")
+    
+    # Display violated articles
+    violated_articles = violations.get('violated_articles', [])
     
-    # Column 2: Violations
-    with col2:
-        st.subheader("📋 Violations")
+    if violated_articles:
+        st.warning(f"**{len(violated_articles)} Article(s) Violated**")
         
-        # Parse violations
-        violations_data = result.get('violations', {})
+        # Display each article with explanation
+        explanations = violations.get('explanations', {})
+        for article in violated_articles:
+            with st.expander(f"📄 {article}"):
+                st.write(explanations.get(article, 'No explanation available'))
+    else:
+        st.success("No violations found")
+
+def render_suggestion(suggestion):
+    st.subheader("✏️ Compliant Alternative")
+    
+    # Display suggested text
+    suggested_text = suggestion.get('suggested_text', '')
+    if suggested_text:
+        st.success("**Suggested Text:**")
+        st.write(suggested_text)
         
-        try:
-            if isinstance(violations_data, dict) and 'response' in violations_data:
-                violations = json.loads(violations_data['response'])
-            else:
-                violations = violations_data
-            
-            # Display violated articles
-            violated_articles = violations.get('violated_articles', [])
-            
-            if violated_articles:
-                st.warning(f"**{len(violated_articles)} Article(s) Violated**")
-                
-                # Display each article with explanation
-                explanations = violations.get('explanations', {})
-                for article in violated_articles:
-                    with st.expander(f"📄 {article}"):
-                        st.write(explanations.get(article, 'No explanation available'))
-            else:
-                st.success("No violations found")
+        # Display changes made
+        changes = suggestion.get('changes_made', [])
+        if changes:
+            st.markdown("**Changes Made:**")
+            for change in changes:
+                st.markdown(f"- {change}")
+    else:
+        st.info("No rewrite needed - text appears compliant")
+
+def render_pending(title, message):
+    st.subheader(title)
+    st.caption(message)
+
+def render_writing(text):
+    st.subheader("✏️ Compliant Alternative")
+    st.success("**Suggested Text:**")
+    st.write(text + " ▌")
+
+RENDERERS = {
+    'analysis': render_analysis,
+    'violations': render_violations,
+    'suggestion': render_suggestion,
+}
+
+def render_result(result):
+    col1, col2, col3 = st.columns(3)
+    for column, section in zip((col1, col2, col3), RENDERERS):
+        with column:
+            RENDERERS[section](result.get(section, {}))
+
+# Main analysis logic
+if analyze_button:
+    if not input_text.strip():
+        st.warning("⚠️ Please enter some text to analyze.")
+    else:
+        status = st.empty()
+        status.info("🤖 Agent 1 is analyzing the claim...")
         
-        except (json.JSONDecodeError, TypeError):
-            st.write(violations_data)
-    
-    # Column 3: Suggestion
-    with col3:
-        st.subheader("✏️ Compliant Alternative")
+        # One placeholder per column, replaced as each agent finishes
+        col1, col2, col3 = st.columns(3)
+        slots = {'analysis': col1.empty(), 'violations': col2.empty(), 'suggestion': col3.empty()}
+        with slots['analysis'].container():
+            render_pending("🔍 Analysis", "Waiting for the analyzer...")
         
-        # Parse suggestion
         try:
-            suggestion = json.loads(result.get('suggestion', '{}'))
+            # Call the workflow, showing each result as soon as it exists
+            # (already loaded by the preload above, unless that failed)
+            stream_greenwashing = load_pipeline()
             
-            # Display suggested text
-            suggested_text = suggestion.get('suggested_text', '')
-            if suggested_text:
-                st.success("**Suggested Text:**")
-                st.write(suggested_text)
+            for kind, payload in stream_greenwashing(input_text):
+                if kind == 'analysis':
+                    status.info("📋 Checking the EU directive and drafting a compliant alternative...")
+                    with slots['violations'].container():
+                        render_pending("📋 Violations", "Waiting for the validator...")
+                    with slots['suggestion'].container():
+                        render_pending("✏️ Compliant Alternative", "Waiting for the rewriter...")
                 
-                # Display changes made
-                changes = suggestion.get('changes_made', [])
-                if changes:
-                    st.markdown("**Changes Made:**")
-                    for change in changes:
-                        st.markdown(f"- {change}")
-            else:
-                st.info("No rewrite needed - text appears compliant")
-        
-        except json.JSONDecodeError:
-            st.write(result.get('suggestion', 'No suggestion available'))
+                if kind in RENDERERS:
+                    with slots[kind].container():
+                        RENDERERS[kind](payload)
+                elif kind == 'suggestion_text':
+                    with slots['suggestion'].container():
+                        render_writing(payload)
+                elif kind == 'result':
+                    # Sections that were skipped (e.g. no rewrite needed) are filled in now
+                    for section, render in RENDERERS.items():
+                        with slots[section].container():
+                            render(payload[section])
+                    
+                    # Store in session state so it persists
+                    st.session_state['result'] = payload
+                    st.session_state['analyzed'] = True
+            
+            status.success("✅ Analysis Complete!")
+            
+        except Exception as e:
+            status.empty()
+            st.error(f"❌ Error during analysis: {str(e)}")
+            st.error("Please check your API key and try again.")
+            st.session_state['analyzed'] = False
+# Display results of an earlier analysis (Streamlit re-runs the script on every interaction)
+elif st.session_state.get('analyzed', False):
+    st.success("✅ Analysis Complete!")
+    render_result(st.session_state.get('result', {}))
 # Sidebar with information
 with st.sidebar:
     st.header("ℹ️ About")
@@ -0,0 +1,362 @@
+"""
+Batch Analysis
+Runs many marketing claims through the greenwashing workflow
+1. Stream claims from a JSONL, CSV or XLSX file
+2. Analyze them concurrently (bounded number in flight)
+3. Append each result to a JSONL file as soon as it is ready
+
+The JSONL output doubles as the checkpoint: re-running the same command
+skips every claim that already has a successful result, so a crashed or
+interrupted run resumes where it stopped.
+
+Usage:
+    python batch.py claims.xlsx results.jsonl --concurrency 8
+    python batch.py claims.csv results.parquet --text-column claim
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+BATCH_CONCURRENCY = 4  # Claims analyzed at the same time
+TEXT_COLUMNS = ("text", "claim")  # Tried in order when no column is given
+ID_COLUMNS = ("id", "claim_id")  # Row number is used when none of these exist
+
+
+def _clean_row(row):
+    # Spreadsheet headers often carry stray spaces (" Art. Law")
+    return {str(key).strip(): value for key, value in row.items() if key is not None}
+
+
+def _iter_rows(path):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    elif extension == ".csv":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+
+    elif extension in (".xlsx", ".xlsm"):
+        import openpyxl  # Only needed for spreadsheets
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            for values in rows:
+                if any(value is not None for value in values):
+                    yield dict(zip(header, values))
+        finally:
+            workbook.close()
+
+    else:
+        raise ValueError(f"Unsupported claims file: {path} (expected .jsonl, .csv or .xlsx)")
+
+
+def iter_claims(path, text_column=None, id_column=None):
+    """
+    Stream claims from a file without loading it whole
+
+    Args:
+        path: .jsonl (one object per line), .csv or .xlsx (first sheet, header row)
+        text_column: Field holding the claim text (default: first of TEXT_COLUMNS present)
+        id_column: Field holding a unique claim id (default: first of ID_COLUMNS
+                   present, otherwise the row number)
+
+    Yields:
+        Dicts with "id", "text" and the other fields of the row under "fields"
+    """
+    for number, row in enumerate(_iter_rows(path), 1):
+        row = _clean_row(row)
+
+        text_key = text_column or next((key for key in TEXT_COLUMNS if key in row), None)
+        if text_key is None:
+            raise ValueError(f"No claim text column in {path}; pass text_column (fields: {list(row)})")
+        text = str(row.get(text_key) or "").strip()
+        if not text:
+            continue
+
+        id_key = id_column or next((key for key in ID_COLUMNS if key in row), None)
+        claim_id = str(row[id_key]) if id_key else str(number)
+
+        fields = {key: value for key, value in row.items() if key not in (text_key, id_key)}
+        yield {"id": claim_id, "text": text, "fields": fields}
+
+
+def completed_ids(path):
+    """
+    Ids of the claims that already have a successful result in a JSONL output
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Last line of a crashed run may be cut off
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def checkpoint_path(output_path):
+    """
+    JSONL file results are streamed to (the output itself unless it is Parquet)
+    """
+    if output_path.lower().endswith(".parquet"):
+        return output_path + ".jsonl"
+    return output_path
+
+
+def write_parquet(jsonl_path, parquet_path):
+    """
+    Convert the successful results of a JSONL checkpoint to Parquet
+    (needs pandas with pyarrow or fastparquet)
+    """
+    import pandas as pd
+
+    records = {}
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                records[record["id"]] = record  # Later retries win
+
+    frame = pd.DataFrame(list(records.values()))
+    # Nested values don't have a fixed Parquet schema, keep them as JSON text
+    for column in ("analysis", "violations", "suggestion", "fields"):
+        if column in frame:
+            frame[column] = frame[column].map(json.dumps)
+    frame.to_parquet(parquet_path, index=False)
+
+
+async def _analyze(claim, analyze, metrics_path=None):
+    start = time.perf_counter()
+    metrics = None
+    try:
+        if metrics_path:
+            from metrics import MetricsCallback
+            # With several claims in flight, each claim's counter deltas include
+            # its neighbours'; the run-wide line at the end has the exact totals
+            metrics = MetricsCallback(label=claim["id"])
+            result = await analyze(claim["text"], callbacks=[metrics])
+        else:
+            result = await analyze(claim["text"])
+    except Exception as e:
+        if metrics is not None:
+            metrics.to_jsonl(metrics_path)
+        return {
+            "id": claim["id"],
+            "text": claim["text"],
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+            "seconds": time.perf_counter() - start,
+            "fields": claim["fields"],
+        }
+    if metrics is not None:
+        metrics.to_jsonl(metrics_path)
+    return {
+        "id": claim["id"],
+        "text": claim["text"],
+        "status": "ok",
+        "analysis": result.get("analysis", {}),
+        "violations": result.get("violations", {}),
+        "suggestion": result.get("suggestion", {}),
+        "seconds": time.perf_counter() - start,
+        "fields": claim["fields"],
+    }
+
+
+async def run_batch_async(
+    claims,
+    output_path,
+    concurrency=BATCH_CONCURRENCY,
+    analyze=None,
+    progress=True,
+    metrics_path=None,
+):
+    """
+    Analyze a stream of claims and append the results to a JSONL file
+
+    Claims already recorded as successful in the output are skipped, and
+    failed claims are recorded with status "error" so the next run retries
+    them. At most `concurrency` claims are in flight and only a bounded
+    number are read ahead, so arbitrarily large inputs run in constant memory.
+
+    Args:
+        claims: Iterable of claim dicts (see iter_claims)
+        output_path: JSONL file results are appended to
+        concurrency: Claims analyzed at the same time
+        analyze: Async function text -> result dict
+                 (default: graph.analyze_greenwashing_async)
+        progress: Print progress to stderr
+        metrics_path: Append per-claim timing/token events here (JSONL),
+                      then a summary line with the whole run's cache and
+                      embedding counters; `analyze` must then accept a
+                      `callbacks` argument
+
+    Returns:
+        Dict of run statistics (counts, elapsed seconds, claims per minute)
+    """
+    if analyze is None:
+        from graph import analyze_greenwashing_async
+        from tools import warmup
+        analyze = analyze_greenwashing_async
+        # Load the index once up front instead of inside the first claims
+        await asyncio.to_thread(warmup)
+
+    run_metrics = None
+    if metrics_path:
+        from metrics import MetricsCallback
+        run_metrics = MetricsCallback(label="batch")  # Only its cache/embedding counters are used
+
+    done = completed_ids(output_path)
+    pending = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"processed": 0, "ok": 0, "errors": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    async def worker(out):
+        while True:
+            claim = await pending.get()
+            if claim is None:
+                return
+            record = await _analyze(claim, analyze, metrics_path)
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()  # Every finished claim is checkpointed immediately
+
+            stats["processed"] += 1
+            stats["ok" if record["status"] == "ok" else "errors"] += 1
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(
+                    f"\r{stats['processed']} analyzed ({stats['errors']} failed, "
+                    f"{stats['skipped']} skipped) - {stats['processed'] / elapsed * 60:.1f} claims/min",
+                    end="",
+                    file=sys.stderr,
+                    flush=True,
+                )
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        workers = [asyncio.create_task(worker(out)) for _ in range(concurrency)]
+
+        seen = set()
+        for claim in claims:
+            if claim["id"] in done or claim["id"] in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(claim["id"])
+            await pending.put(claim)
+
+        for _ in workers:
+            await pending.put(None)
+        await asyncio.gather(*workers)
+
+    if run_metrics is not None:
+        run_metrics.to_jsonl(metrics_path)
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = elapsed
+    stats["claims_per_minute"] = stats["processed"] / elapsed * 60 if elapsed else 0.0
+    if progress:
+        print(file=sys.stderr)
+    return stats
+
+
+def run_batch(
+    input_path,
+    output_path,
+    concurrency=BATCH_CONCURRENCY,
+    text_column=None,
+    id_column=None,
+    limit=None,
+    analyze=None,
+    quiet=True,
+    metrics_path=None,
+):
+    """
+    Analyze every claim in a file (resuming an earlier run if the output exists)
+
+    Args:
+        input_path: Claims file (.jsonl, .csv or .xlsx)
+        output_path: Results file (.jsonl, or .parquet - results are then
+                     streamed to "<output>.jsonl" and converted at the end)
+        concurrency: Claims analyzed at the same time
+        text_column: Column holding the claim text
+        id_column: Column holding a unique claim id
+        limit: Only read the first `limit` claims
+        analyze: Async function text -> result dict (default: the workflow)
+        quiet: Silence the per-agent log lines of the workflow
+        metrics_path: Append per-claim timing/token events here (JSONL)
+
+    Returns:
+        Dict of run statistics
+    """
+    claims = iter_claims(input_path, text_column, id_column)
+    if limit is not None:
+        claims = (claim for _, claim in zip(range(limit), claims))
+
+    jsonl_path = checkpoint_path(output_path)
+    # Per-agent prints are unreadable once several claims interleave
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext():
+            stats = asyncio.run(
+                run_batch_async(claims, jsonl_path, concurrency, analyze, metrics_path=metrics_path)
+            )
+
+    if jsonl_path != output_path:
+        write_parquet(jsonl_path, output_path)
+
+    print(
+        f"✅ {stats['ok']} analyzed, {stats['errors']} failed, {stats['skipped']} skipped "
+        f"in {stats['seconds']:.1f}s ({stats['claims_per_minute']:.1f} claims/min) → {output_path}"
+    )
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a file of marketing claims for greenwashing")
+    parser.add_argument("input", help="Claims file (.jsonl, .csv or .xlsx)")
+    parser.add_argument("output", help="Results file (.jsonl or .parquet)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Claims analyzed at the same time")
+    parser.add_argument(
+        "--text-column", help=f"Column holding the claim text (default: first of {', '.join(TEXT_COLUMNS)} present)"
+    )
+    parser.add_argument("--id-column", help="Column holding a unique claim id")
+    parser.add_argument("--limit", type=int, help="Only analyze the first N claims")
+    parser.add_argument("--metrics", help="Append per-claim timing/token events to this JSONL file")
+    parser.add_argument("--verbose", action="store_true", help="Show per-agent log lines")
+    args = parser.parse_args(argv)
+
+    run_batch(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        text_column=args.text_column,
+        id_column=args.id_column,
+        limit=args.limit,
+        quiet=not args.verbose,
+        metrics_path=args.metrics,
+    )
+
+
+if __name__ == "__main__":
+    main()
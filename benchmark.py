@@ -0,0 +1,361 @@
+"""
+Offline Benchmark
+Times the hot paths against deterministic local stand-ins (fakes.py), so it
+runs without network access or an API key:
+1. Chunking    - PDF pages → article chunks
+2. Indexing    - full build of the vector database (hash embeddings)
+3. Retrieval   - article lookup, sparse, dense and hybrid search
+4. Pre-screen  - rule-based scan
+5. Workflow    - graph.app end to end with a fake chat model (sync, then
+                 concurrent async)
+
+Each stage reports p50/p95 latency, throughput and peak Python memory.
+Everything runs in a temporary directory; the repo's databases and caches
+are never touched.
+
+Usage:
+    python benchmark.py                              # all stages
+    python benchmark.py --stages retrieval workflow --llm-latency 0.2
+    python benchmark.py --json results.json          # save the report
+    python benchmark.py --baseline results.json      # exit 1 if p95 regressed
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+STAGES = ["chunking", "indexing", "retrieval", "prescreen", "workflow"]
+REGRESSION_TOLERANCE = 0.25  # Allowed p95 slowdown against a baseline (25%)
+
+QUERIES = [
+    "Article 5 future environmental performance commitments",
+    "Article 6 comparative claims between products",
+    "What does the directive say about vague environmental claims?",
+    "What are the requirements for substantiation of claims?",
+    "What penalties exist for greenwashing?",
+    "environmental labelling schemes certification third-party verification",
+]
+
+CLAIMS = [
+    "Our 100% eco-friendly sustainable product is completely carbon neutral",
+    "We will be climate neutral by 2030",
+    "Greener than the leading brand, with 30% less plastic",
+    "Certified green packaging you can trust",
+    "Made from natural, responsible materials",
+    "Comfortable running shoes with a lifetime warranty",
+]
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(stage, latencies, items=None, peak_bytes=0, unit="op"):
+    """
+    Summary row for one stage
+
+    Args:
+        stage: Stage name
+        latencies: Seconds per operation
+        items: Items processed in total (defaults to one per operation)
+        peak_bytes: Peak traced Python memory
+        unit: What one item is (for the throughput label)
+    """
+    total = sum(latencies)
+    items = len(latencies) if items is None else items
+    return {
+        "stage": stage,
+        "runs": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "throughput": items / total if total else 0.0,
+        "unit": unit,
+        "peak_mb": peak_bytes / 1e6,
+    }
+
+
+def timed(fn, repeat):
+    """
+    Run fn `repeat` times and return each run's duration
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def peak_memory(fn):
+    """
+    Peak Python memory (bytes) allocated during one call of fn
+    Measured on a separate run so tracing doesn't skew the timings
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def quiet():
+    # The pipeline prints progress lines; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def configure(workdir, embed_latency, llm_latency, search_rounds):
+    """
+    Point the pipeline at the fakes and a scratch directory
+    """
+    os.chdir(workdir)
+
+    import rag
+    from embedding_cache import CachedEmbeddings, EmbeddingCache
+    from fakes import FakeChatModel, HashEmbeddings
+
+    rag._embeddings = CachedEmbeddings(
+        HashEmbeddings(latency=embed_latency), "hash", EmbeddingCache(os.path.join(workdir, "embeddings.sqlite"))
+    )
+    rag.VECTOR_BACKEND = "numpy"
+
+    from agents import set_llm
+
+    set_llm(FakeChatModel(latency=llm_latency, search_rounds=search_rounds))
+
+
+def bench_chunking(repeat):
+    from rag import PDF_PATH, iter_pdf_chunks
+
+    chunks = []
+
+    def run():
+        chunks[:] = list(iter_pdf_chunks(PDF_PATH))
+
+    with quiet():
+        latencies = timed(run, repeat)
+        peak = peak_memory(run)
+    return report("chunking", latencies, items=len(chunks) * repeat, peak_bytes=peak, unit="chunk")
+
+
+def bench_indexing(repeat, workdir):
+    import rag
+
+    counter = iter(range(repeat + 1))
+
+    def run():
+        # Fresh database each time, and no embedding cache hits from the last build
+        build = os.path.join(workdir, f"build_{next(counter)}")
+        rag.CHROMA_DB_DIR = os.path.join(build, "chroma_db")
+        rag.NUMPY_INDEX_DIR = os.path.join(build, "numpy_index")
+        rag._embeddings.cache.clear()
+        rag.setup_rag()
+
+    with quiet():
+        latencies = timed(run, repeat)
+        peak = peak_memory(run)
+        count = len(rag.load_vector_store())
+
+    # Later stages use the last build
+    import tools
+    tools.CHROMA_DB_DIR = rag.CHROMA_DB_DIR
+    return report("indexing", latencies, items=count * repeat, peak_bytes=peak, unit="chunk")
+
+
+def bench_retrieval(repeat):
+    import tools
+    from rag import search_directive
+
+    with quiet():
+        vectorstore = tools.get_vectorstore()
+
+    # Direct article lookup only applies to queries naming an article
+    article_queries = [query for query in QUERIES if query.startswith("Article")]
+
+    rows = []
+    for mode in ["lookup", "sparse", "dense", "hybrid"]:
+        queries = article_queries if mode == "lookup" else QUERIES
+
+        def run():
+            for query in queries:
+                search_directive(
+                    query, vectorstore, k=5, article_lookup=mode == "lookup",
+                    mode="sparse" if mode == "lookup" else mode, use_semantic_cache=False,
+                )
+
+        run()  # Warm the lazy indexes and the embedding cache
+        latencies = [seconds / len(queries) for seconds in timed(run, repeat)]
+        rows.append(report(f"retrieval/{mode}", latencies, peak_bytes=peak_memory(run), unit="query"))
+    return rows
+
+
+def bench_prescreen(repeat):
+    from prescreen import prescreen
+
+    texts = CLAIMS * 100
+
+    def run():
+        for text in texts:
+            prescreen(text)
+
+    latencies = [seconds / len(texts) for seconds in timed(run, repeat)]
+    return report("prescreen", latencies, peak_bytes=peak_memory(run), unit="claim")
+
+
+def bench_workflow(repeat, concurrency):
+    import graph
+
+    def run_one(text):
+        graph.get_app().invoke(graph.initial_state(text))
+
+    async def run_many(texts):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(text):
+            async with semaphore:
+                await graph.analyze_greenwashing_async(text, use_cache=False)
+
+        await asyncio.gather(*(one(text) for text in texts))
+
+    with quiet():
+        run_one(CLAIMS[0])  # Load the index and warm caches
+
+        latencies = []
+        for _ in range(repeat):
+            for text in CLAIMS:
+                start = time.perf_counter()
+                run_one(text)
+                latencies.append(time.perf_counter() - start)
+        sync_row = report("workflow/sync", latencies, peak_bytes=peak_memory(lambda: run_one(CLAIMS[0])), unit="claim")
+
+        texts = CLAIMS * repeat
+        start = time.perf_counter()
+        asyncio.run(run_many(texts))
+        elapsed = time.perf_counter() - start
+        async_row = report(
+            f"workflow/async x{concurrency}",
+            [elapsed / len(texts)] * len(texts),
+            peak_bytes=peak_memory(lambda: asyncio.run(run_many(CLAIMS))),
+            unit="claim",
+        )
+
+    return [sync_row, async_row]
+
+
+def run_benchmark(stages=None, repeat=5, embed_latency=0.0, llm_latency=0.0, search_rounds=1, concurrency=8):
+    """
+    Run the selected stages and return their report rows
+    """
+    stages = stages or STAGES
+    cwd = os.getcwd()
+    # Keep the repo importable after moving into the scratch directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="greenwashing-bench-") as workdir:
+        try:
+            configure(workdir, embed_latency, llm_latency, search_rounds)
+
+            if "chunking" in stages:
+                rows.append(bench_chunking(repeat))
+            # Retrieval and the workflow need an index, so always build one
+            if "indexing" in stages or {"retrieval", "workflow"} & set(stages):
+                row = bench_indexing(repeat if "indexing" in stages else 1, workdir)
+                if "indexing" in stages:
+                    rows.append(row)
+            if "retrieval" in stages:
+                rows.extend(bench_retrieval(repeat))
+            if "prescreen" in stages:
+                rows.append(bench_prescreen(repeat))
+            if "workflow" in stages:
+                rows.extend(bench_workflow(repeat, concurrency))
+        finally:
+            os.chdir(cwd)
+            # Before the scratch directory (and the cache file in it) is removed
+            import rag
+            if rag._embeddings is not None:
+                rag._embeddings.cache.close()
+
+    return rows
+
+
+def print_report(rows):
+    print(f"{'stage':<22}{'runs':>6}{'p50 ms':>11}{'p95 ms':>11}{'throughput':>18}{'peak MB':>10}")
+    for row in rows:
+        throughput = f"{row['throughput']:,.1f} {row['unit']}/s"
+        print(
+            f"{row['stage']:<22}{row['runs']:>6}{row['p50_ms']:>11.3f}{row['p95_ms']:>11.3f}"
+            f"{throughput:>18}{row['peak_mb']:>10.2f}"
+        )
+
+
+def find_regressions(rows, baseline_rows, tolerance=REGRESSION_TOLERANCE):
+    """
+    Stages whose p95 latency got worse than the baseline by more than `tolerance`
+    """
+    baseline = {row["stage"]: row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        before = baseline.get(row["stage"])
+        if before and before["p95_ms"] > 0 and row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append((row["stage"], before["p95_ms"], row["p95_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the greenwashing pipeline")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="Stages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Fake embedding call latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM call latency (s)")
+    parser.add_argument("--search-rounds", type=int, default=1, help="Tool calls each fake agent makes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Claims in flight for the async workflow run")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Earlier --json report; exit 1 if any p95 regressed")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="Allowed p95 slowdown")
+    args = parser.parse_args(argv)
+
+    # Resolve paths before the benchmark moves into its scratch directory
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    rows = run_benchmark(
+        stages=args.stages,
+        repeat=args.repeat,
+        embed_latency=args.embed_latency,
+        llm_latency=args.llm_latency,
+        search_rounds=args.search_rounds,
+        concurrency=args.concurrency,
+    )
+    print_report(rows)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = find_regressions(rows, json.load(f), args.tolerance)
+        for stage, before, after in regressions:
+            print(f"❌ {stage}: p95 {before:.3f} ms → {after:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print("✅ No p95 regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Context Assembly
+Turns retrieved chunks into the text that goes into agent prompts
+- A chunk already shown earlier in the same agent run is replaced by a
+  one-line reference instead of being repeated
+- Long chunks are cut down to the paragraphs most relevant to the query
+- Everything fits a token budget per search and per agent run
+"""
+
+import contextlib
+import contextvars
+import re
+import threading
+
+from retrieval import tokenize
+
+CALL_TOKEN_BUDGET = 1200  # Max retrieved tokens one search adds to a prompt
+RUN_TOKEN_BUDGET = 4000  # Max retrieved tokens per agent run (all searches together)
+CHUNK_TOKEN_BUDGET = 500  # Max tokens kept from a single chunk
+CHARS_PER_TOKEN = 4  # Rough average for English text with OpenAI tokenizers
+
+# Paragraph breaks: a blank line, or a line starting a numbered point ("1.", "(a)")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n|\n(?=\s*(?:\d+\.|\(\d+\)|\([a-z]\))\s)")
+
+_current = contextvars.ContextVar("context_assembler", default=None)
+
+
+def estimate_tokens(text):
+    """
+    Approximate token count (no tokenizer download needed)
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _truncate(text, max_tokens):
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " [...]"
+
+
+def relevant_paragraphs(text, query, max_tokens=CHUNK_TOKEN_BUDGET):
+    """
+    Shorten a chunk to its most relevant paragraphs
+
+    The first paragraph (usually the article heading) is always kept; the
+    others are ranked by how many query terms they contain and kept in
+    their original order while they fit. Gaps are marked with "[...]".
+
+    Args:
+        text: Chunk text
+        query: What the chunk was retrieved for
+        max_tokens: Budget for the shortened text
+
+    Returns:
+        The text itself if it fits, otherwise the shortened version
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    paragraphs = [paragraph.strip() for paragraph in PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+    heading = _truncate(paragraphs[0], max_tokens // 4)
+    body = paragraphs[1:]
+    budget = max_tokens - estimate_tokens(heading)
+
+    terms = set(tokenize(query))
+    # sorted() is stable, so equally relevant paragraphs keep document order
+    ranked = sorted(range(len(body)), key=lambda i: -len(terms.intersection(tokenize(body[i]))))
+
+    keep = {}
+    for i in ranked:
+        cost = estimate_tokens(body[i])
+        if cost <= budget:
+            keep[i] = body[i]
+            budget -= cost
+    if not keep and ranked and budget > 0:
+        # Even the best paragraph is too long: keep its beginning
+        keep[ranked[0]] = _truncate(body[ranked[0]], budget)
+
+    parts = [heading]
+    previous = -1
+    for i in sorted(keep):
+        if i != previous + 1:
+            parts.append("[...]")
+        parts.append(keep[i])
+        previous = i
+    if previous != len(body) - 1:
+        parts.append("[...]")
+
+    return "\n".join(parts)
+
+
+class ContextAssembler:
+    """
+    Formats search results for one agent run
+    Remembers which chunks the agent has already seen and how much of the
+    run's token budget is used. Safe to share between the parallel tool
+    calls of one run.
+    """
+
+    def __init__(self, run_budget=RUN_TOKEN_BUDGET, call_budget=CALL_TOKEN_BUDGET, chunk_budget=CHUNK_TOKEN_BUDGET):
+        self.run_budget = run_budget
+        self.call_budget = call_budget
+        self.chunk_budget = chunk_budget
+        self.used = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def assemble(self, query, documents):
+        """
+        Prompt text for one search's results
+
+        Args:
+            query: Search query (used to pick relevant paragraphs)
+            documents: Retrieved chunks, best first
+
+        Returns:
+            Formatted text within the remaining budget
+        """
+        sections = []
+        omitted = 0
+
+        with self._lock:
+            budget = min(self.call_budget, self.run_budget - self.used)
+
+            for i, doc in enumerate(documents, 1):
+                label = f"Result {i} - {doc.metadata.get('article', 'Unknown Article')} - Page {doc.metadata.get('page', 'Unknown')}"
+
+                if doc.page_content in self._seen:
+                    sections.append(f"[{label} - already provided above]")
+                    continue
+                if budget <= 0:
+                    omitted += 1
+                    continue
+
+                text = relevant_paragraphs(doc.page_content, query, min(self.chunk_budget, budget))
+                cost = estimate_tokens(text)
+                budget -= cost
+                self.used += cost
+                self._seen.add(doc.page_content)
+                sections.append(f"[{label}]\n{text}")
+
+        if omitted:
+            sections.append(f"[{omitted} more result(s) omitted: context budget reached, answer with what you have]")
+
+        return "\n\n".join(sections) if sections else "No results found."
+
+
+@contextlib.contextmanager
+def agent_context(**budgets):
+    """
+    Scope one agent run: searches made inside share a ContextAssembler,
+    so chunks are deduplicated across the run's tool calls
+
+    Usage:
+        with agent_context():
+            agent.invoke(...)
+    """
+    token = _current.set(ContextAssembler(**budgets))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_assembler():
+    """
+    Assembler of the agent run in progress (a fresh one outside any run)
+    """
+    return _current.get() or ContextAssembler()
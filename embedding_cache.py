@@ -0,0 +1,291 @@
+"""
+Embedding Cache
+Persistent, content-addressed cache for embedding vectors
+The same text (after whitespace normalization) is only ever sent to the
+embedding API once per model, whether it comes from indexing or from a query
+"""
+
+import asyncio
+import atexit
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = "./embedding_cache.sqlite"  # Where cached vectors are stored
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000  # Least recently used vectors are evicted beyond this
+TOUCH_FLUSH_SIZE = 1000  # Pending last_used updates written in one go
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normalize text before hashing so trivial whitespace/unicode differences
+    map to the same cache entry
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model, text):
+    """
+    Build the cache key for a (model, text) pair
+
+    Args:
+        model: Embedding model name
+        text: Raw text to embed
+
+    Returns:
+        Key string "<model>:<sha256 of normalized text>"
+    """
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed vector store with size-bounded LRU eviction
+    Safe to share between threads of one process. Lookups don't write:
+    the last_used times of hits are kept in memory and written with the
+    next put_many (before eviction), once TOUCH_FLUSH_SIZE are pending, or
+    on close() (also run at interpreter exit).
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # key -> last_used not yet written
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+        # Touches still pending at exit would be lost, and eviction would then
+        # drop vectors that were in use
+        atexit.register(self._close_at_exit)
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once
+
+        Args:
+            keys: List of cache keys
+
+        Returns:
+            Dict of key -> vector (list of floats) for the keys that were found
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            # SQLite limits the number of bound parameters, so query in slices
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("d", blob).tolist()
+
+            # Touch the hits so eviction keeps recently used vectors
+            if found:
+                now = time.time()
+                self._touched.update(dict.fromkeys(found, now))
+                if len(self._touched) >= TOUCH_FLUSH_SIZE:
+                    self._flush_touched()
+                    self._conn.commit()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return found
+
+    def _flush_touched(self):
+        # Caller holds the lock and commits
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key, now in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def flush(self):
+        """
+        Write the pending last_used updates now
+        """
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def close(self):
+        """
+        Write the pending last_used updates and close the database
+        (the cache can't be used afterwards; closing twice is a no-op)
+        """
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._flush_touched()
+                self._conn.commit()
+            finally:
+                self._conn.close()
+                self._conn = None
+        atexit.unregister(self._close_at_exit)
+
+    def _close_at_exit(self):
+        try:
+            self.close()
+        except sqlite3.Error as e:
+            # e.g. the cache lived in a temporary directory already removed
+            print(f"⚠️ Could not save embedding cache usage to {self.path}: {e}")
+
+    def put_many(self, items):
+        """
+        Store several vectors at once and evict the oldest entries if needed
+
+        Args:
+            items: Dict of key -> vector
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, array("d", vector).tobytes(), now) for key, vector in items.items()]
+
+        with self._lock:
+            self._flush_touched()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self):
+        """
+        Hit/miss counters for this process
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def clear(self):
+        """
+        Drop every cached vector and reset the counters
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._touched.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain embedder and serves repeated texts from an EmbeddingCache
+    Only texts that are not cached yet are sent to the underlying embedder
+    """
+
+    def __init__(self, underlying, model, cache=None):
+        self.underlying = underlying
+        self.model = model
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    def embed_documents(self, texts):
+        keys = [cache_key(self.model, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each missing text once, even if it appears several times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        key = cache_key(self.model, text)
+        vectors = self.cache.get_many([key])
+
+        if key not in vectors:
+            vector = self.underlying.embed_query(text)
+            self.cache.put_many({key: vector})
+            return vector
+
+        return vectors[key]
+
+    # The async methods do their SQLite reads and writes in a worker thread,
+    # so cache I/O doesn't stall the other coroutines on the event loop
+    async def aembed_documents(self, texts):
+        keys = [cache_key(self.model, text) for text in texts]
+        vectors = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = await self.underlying.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            await asyncio.to_thread(self.cache.put_many, computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text):
+        key = cache_key(self.model, text)
+        vectors = await asyncio.to_thread(self.cache.get_many, [key])
+
+        if key not in vectors:
+            vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self.cache.put_many, {key: vector})
+            return vector
+
+        return vectors[key]
+
+    def stats(self):
+        return self.cache.stats()
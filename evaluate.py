@@ -0,0 +1,241 @@
+"""
+Retrieval Evaluation
+Measures whether search_directive returns chunks of the right article
+1. Load labeled queries (the spreadsheet's obligations and their " Art. Law"
+   column, or a JSONL file of {"query": ..., "articles": [...]})
+2. Build one index per chunker from the directive PDF
+3. Run every query for every chunker x retrieval mode x k
+4. Report recall@k, MRR and per-query latency side by side, and the
+   cheapest configuration that keeps the best recall
+
+Usage:
+    python evaluate.py                                  # spreadsheet, real embeddings
+    python evaluate.py labeled.jsonl --k 1 3 5 --modes sparse hybrid
+    python evaluate.py --offline --json evaluation.json # hash embeddings, no API
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from batch import iter_claims
+from retrieval import article_numbers
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "green claims directive.xlsx")
+LABEL_COLUMNS = ("articles", "Art. Law")  # Tried in order
+QUERY_COLUMNS = {".jsonl": "query"}  # Query text column by file type when none is given
+SPREADSHEET_QUERY_COLUMN = "Summary of the obligation"  # Obligations of the bundled spreadsheet
+K_VALUES = [1, 3, 5]
+MODES = ["sparse", "dense", "hybrid"]
+CHUNKERS = {  # Name -> max characters per chunk (articles longer than that are split)
+    "article": 6000,
+    "article-2000": 2000,
+    "article-1000": 1000,
+}
+RECALL_TOLERANCE = 0.0  # Recall a cheaper configuration may lose against the best one
+MODE_COST = {"sparse": 0, "hybrid": 1, "dense": 1}  # Sparse needs no embedding call
+
+
+def _labels(value):
+    """
+    Article labels of one row ("Article 3", 3, [3, 5], "Art. 3" ...)
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [label for item in value for label in _labels(item)]
+    if isinstance(value, (int, float)) or str(value).strip().isdigit():
+        return [f"Article {int(float(value))}"]
+    # Free text such as "Directive 2005/29/EC" names no article of this directive
+    return [f"Article {number}" for number in article_numbers(str(value))]
+
+
+def load_labeled(path=DEFAULT_DATASET, text_column=None):
+    """
+    Labeled queries from a JSONL, CSV or XLSX file
+
+    Rows without an article label are skipped. The query text comes from
+    `text_column`, else "query" in JSONL files and "Summary of the
+    obligation" in CSV/XLSX files.
+
+    Returns:
+        List of dicts with "id", "query" and "articles" (e.g. ["Article 3"])
+    """
+    extension = os.path.splitext(path)[1].lower()
+    text_column = text_column or QUERY_COLUMNS.get(extension, SPREADSHEET_QUERY_COLUMN)
+
+    dataset = []
+    for claim in iter_claims(path, text_column=text_column):
+        label = next((claim["fields"][column] for column in LABEL_COLUMNS if column in claim["fields"]), None)
+        articles = list(dict.fromkeys(_labels(label)))
+        if articles and claim["text"].strip():
+            dataset.append({"id": claim["id"], "query": claim["text"].strip(), "articles": articles})
+    return dataset
+
+
+def build_index(pages, max_chars, embeddings, directory):
+    """
+    Chunk the parsed pages and index them in a throwaway NumPy store
+    """
+    from numpy_store import NumpyVectorStore
+    from rag import iter_article_chunks
+
+    chunks = list(iter_article_chunks(pages, max_chars=max_chars))
+    return NumpyVectorStore.from_texts(
+        [chunk.page_content for chunk in chunks],
+        embeddings,
+        metadatas=[chunk.metadata for chunk in chunks],
+        directory=directory,
+    )
+
+
+def score_query(results, relevant):
+    """
+    (recall, reciprocal rank) of one query's results
+    An article split into several chunks counts once, at its best rank
+    """
+    found = [doc.metadata.get("article") for doc in results]
+    hits = relevant.intersection(found)
+    first = next((rank for rank, article in enumerate(found, 1) if article in relevant), None)
+    return len(hits) / len(relevant), 1 / first if first else 0.0
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def evaluate(dataset, vectorstore, mode, k, article_lookup=True):
+    """
+    Run every labeled query through search_directive
+
+    Returns:
+        Dict with recall_at_k, mrr, p50_ms, p95_ms and the per-query rows
+    """
+    from rag import search_directive
+
+    per_query = []
+    for item in dataset:
+        start = time.perf_counter()
+        results = search_directive(
+            item["query"], vectorstore, k=k, article_lookup=article_lookup,
+            mode=mode, use_semantic_cache=False,
+        )
+        seconds = time.perf_counter() - start
+
+        recall, reciprocal_rank = score_query(results, set(item["articles"]))
+        per_query.append({
+            "id": item["id"],
+            "recall": recall,
+            "reciprocal_rank": reciprocal_rank,
+            "ms": seconds * 1000,
+            "retrieved": [doc.metadata.get("article") for doc in results],
+        })
+
+    latencies = [row["ms"] for row in per_query]
+    return {
+        "recall_at_k": sum(row["recall"] for row in per_query) / len(per_query),
+        "mrr": sum(row["reciprocal_rank"] for row in per_query) / len(per_query),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "queries": per_query,
+    }
+
+
+def run_evaluation(dataset, chunkers=None, modes=None, k_values=None, embeddings=None):
+    """
+    Evaluate every chunker x mode x k combination
+
+    Args:
+        dataset: Output of load_labeled
+        chunkers: Names from CHUNKERS (default: all)
+        modes: Retrieval modes (default: MODES)
+        k_values: Result counts (default: K_VALUES)
+        embeddings: Embedder for the indexes (default: the cached OpenAI one)
+
+    Returns:
+        List of result dicts (chunker, chunks, mode, k and the evaluate() fields)
+    """
+    from rag import PDF_PATH, get_embeddings, iter_pdf_pages
+
+    embeddings = embeddings or get_embeddings()
+    pages = list(iter_pdf_pages(PDF_PATH))  # Parsed once, chunked once per chunker
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="greenwashing-eval-") as workdir:
+        for chunker in chunkers or list(CHUNKERS):
+            vectorstore = build_index(pages, CHUNKERS[chunker], embeddings, os.path.join(workdir, chunker))
+            for mode in modes or MODES:
+                # Warm the lazy BM25/article indexes so they don't count as query latency
+                evaluate(dataset[:1], vectorstore, mode, 1)
+                for k in k_values or K_VALUES:
+                    result = evaluate(dataset, vectorstore, mode, k)
+                    rows.append({"chunker": chunker, "chunks": len(vectorstore), "mode": mode, "k": k, **result})
+    return rows
+
+
+def cheapest(rows, tolerance=RECALL_TOLERANCE):
+    """
+    Cheapest configuration whose recall@k is within `tolerance` of the best
+    Fewer results first (smaller prompts), then no embedding call, then latency
+    """
+    best = max(row["recall_at_k"] for row in rows)
+    candidates = [row for row in rows if row["recall_at_k"] >= best - tolerance]
+    return min(candidates, key=lambda row: (row["k"], MODE_COST.get(row["mode"], 1), row["p50_ms"]))
+
+
+def print_report(rows):
+    print(f"{'chunker':<14}{'chunks':>7}{'mode':>8}{'k':>4}{'recall@k':>10}{'MRR':>7}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        print(
+            f"{row['chunker']:<14}{row['chunks']:>7}{row['mode']:>8}{row['k']:>4}"
+            f"{row['recall_at_k']:>10.3f}{row['mrr']:>7.3f}{row['p50_ms']:>9.3f}{row['p95_ms']:>9.3f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency on labeled queries")
+    parser.add_argument("dataset", nargs="?", default=DEFAULT_DATASET, help="Labeled .jsonl, .csv or .xlsx")
+    parser.add_argument(
+        "--text-column", help=f"Column holding the query text (default: query, or {SPREADSHEET_QUERY_COLUMN})"
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=K_VALUES, help="Result counts to evaluate")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Retrieval modes")
+    parser.add_argument("--chunkers", nargs="+", choices=list(CHUNKERS), default=list(CHUNKERS), help="Chunkers")
+    parser.add_argument("--tolerance", type=float, default=RECALL_TOLERANCE, help="Recall the pick may lose")
+    parser.add_argument("--offline", action="store_true", help="Hash embeddings instead of the OpenAI API")
+    parser.add_argument("--json", help="Write every result, including per-query rows, to this file")
+    args = parser.parse_args(argv)
+
+    dataset = load_labeled(args.dataset, args.text_column)
+    if not dataset:
+        parser.error(f"No labeled queries found in {args.dataset}")
+    print(f"📋 {len(dataset)} labeled queries from {args.dataset}\n")
+
+    embeddings = None
+    if args.offline:
+        from fakes import HashEmbeddings
+        embeddings = HashEmbeddings()
+
+    rows = run_evaluation(dataset, args.chunkers, args.modes, sorted(args.k), embeddings)
+    print_report(rows)
+
+    pick = cheapest(rows, args.tolerance)
+    print(
+        f"\n✅ Cheapest configuration keeping recall@k {pick['recall_at_k']:.3f}: "
+        f"chunker={pick['chunker']} mode={pick['mode']} k={pick['k']}"
+    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
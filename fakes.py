@@ -0,0 +1,195 @@
+"""
+Local stand-ins for the OpenAI models
+Deterministic, network-free replacements used to exercise the pipeline
+offline (indexing, retrieval, agents, benchmarks)
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"\w+")
+_STREAM_PIECE = re.compile(r"\S*\s*")  # Streamed replies arrive word by word
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Hash-based fake embedder
+    Each word is hashed into one of `size` buckets, so texts sharing words
+    get similar vectors and the same text always gets the same vector
+    """
+
+    def __init__(self, size=256, latency=0.0):
+        self.size = size
+        self.latency = latency  # Seconds slept per call, to mimic a remote API
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for token in _TOKEN.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            self.texts_embedded += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            self.texts_embedded += len(texts)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+# Canned final answers in each agent's output format, picked by matching the system prompt
+FAKE_REPLIES = {
+    "greenwashing analyst": json.dumps({
+        "is_greenwashing": True,
+        "confidence": 75,
+        "reasoning": "Vague, unsubstantiated environmental terms.",
+        "flagged_phrases": ["eco-friendly"],
+    }),
+    "legal compliance expert": json.dumps({
+        "violated_articles": ["Article 3", "Article 5"],
+        "explanations": {
+            "Article 3": "Claim is not substantiated by scientific evidence.",
+            "Article 5": "Generic claim without specific information.",
+        },
+    }),
+    "marketing compliance advisor": json.dumps({
+        "suggested_text": "Packaging made with 50% recycled plastic (certified by an independent verifier).",
+        "changes_made": ["Replaced vague term with a specific, verifiable claim"],
+    }),
+}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model that behaves like a tool-calling agent LLM
+    With tools bound, it first requests `search_rounds` tool calls (one per
+    turn, querying with the user's text) and then answers with the canned
+    reply for the agent whose system prompt it recognizes
+    """
+
+    latency: float = 0.0  # Seconds per call, to mimic a remote API
+    search_rounds: int = 1  # Tool calls made before the final answer
+    tool_names: list = []
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": "fake-chat"}
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(tool, "name", None) or tool.__name__ for tool in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _reply(self, messages):
+        rounds = sum(1 for message in messages if isinstance(message, ToolMessage))
+
+        if self.tool_names and rounds < self.search_rounds:
+            question = next(
+                (message.content for message in reversed(messages) if isinstance(message, HumanMessage)),
+                "",
+            )
+            return AIMessage(
+                content="",
+                tool_calls=[{
+                    "name": self.tool_names[0],
+                    "args": {"query": question[:200]},
+                    "id": f"call_{rounds}",
+                }],
+            )
+
+        prompt = " ".join(
+            message.content for message in messages if isinstance(message, SystemMessage)
+        ).lower()
+        for marker, reply in FAKE_REPLIES.items():
+            if marker in prompt:
+                return AIMessage(content=reply)
+        return AIMessage(content=FAKE_REPLIES["marketing compliance advisor"])
+
+    def _result(self, messages):
+        reply = self._reply(messages)
+        # Rough token counts (4 characters per token) so metrics have numbers to report
+        tokens_in = sum(len(str(message.content)) for message in messages) // 4
+        tokens_out = (len(reply.content) + len(json.dumps(reply.tool_calls))) // 4
+        reply.usage_metadata = {
+            "input_tokens": tokens_in,
+            "output_tokens": tokens_out,
+            "total_tokens": tokens_in + tokens_out,
+        }
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _chunks(self, messages):
+        reply = self._result(messages).generations[0].message
+        if reply.tool_calls:
+            call = reply.tool_calls[0]
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}],
+                usage_metadata=reply.usage_metadata,
+            ))
+            return
+        pieces = [piece for piece in _STREAM_PIECE.findall(reply.content) if piece] or [""]
+        for i, piece in enumerate(pieces):
+            # Usage is reported once, on the last chunk (as OpenAI does)
+            usage = reply.usage_metadata if i == len(pieces) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -1,13 +1,33 @@
 
-from typing import TypedDict, Annotated
-from langgraph.graph import StateGraph
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import json
+import operator
+import os
+import threading
+import time
+import uuid
+from typing import Annotated, TypedDict
 
 # Define constants
 END = "__end__"
 START = "__start__"
-from langgraph.graph.message import add_messages
-from langchain_core.messages import HumanMessage, AIMessage
-from agents import analyzer_agent, validator_agent, rewriter_agent
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, SystemMessage, messages_to_dict
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+from agents import get_agent, get_llm, llm_settings
+from agents import analyzer_instructions, validator_instructions, validator_direct_instructions, rewriter_instructions
+from context import RUN_TOKEN_BUDGET, ContextAssembler, agent_context
+from embedding_cache import normalize_text
+from query_cache import QueryCache
+from prescreen import SUBSTANTIATION, prescreen
+import rag
+import tools
+from rag import fetch_articles, get_article_index
+from schemas import Analysis, Rewrite, Validation, aparse_with_repair, parse_with_repair, partial_json_string
+from tools import aget_vectorstore, get_loaded_index_version, get_vectorstore
 
 # Define the state that flows between agents
 class AgentState(TypedDict):
@@ -17,9 +37,16 @@ class AgentState(TypedDict):
     """
     # Input
     input_text: str  # Original marketing text from user
+    trace_id: str  # Identifies this run's records in the trace file
     
-    # Messages (conversation history with agents)
-    messages: Annotated[list, add_messages]
+    # Only compact per-stage outputs live in the state. The agents' full
+    # message histories (tool calls, retrieved chunks) are dropped as soon as
+    # a node has parsed them, or spilled to TRACE_PATH when TRACE_MESSAGES is on
+    
+    # Pre-screen outputs
+    prescreen_clean: bool
+    prescreen_phrases: list
+    likely_titles: list  # Headings of the articles the pre-screen points to
     
     # Agent 1 outputs
     is_greenwashing: bool
@@ -34,273 +61,784 @@ class AgentState(TypedDict):
     # Agent 3 outputs
     suggested_text: str
     changes_made: list
+    
+    # Stages whose reply couldn't be parsed and got a fallback (parallel
+    # stages may both add to it)
+    unparsed_stages: Annotated[list, operator.add]
+# Workflow options
+WORKFLOW_MODE = "parallel"  # "sequential" (analyzer → validator → rewriter) or "parallel" (validator ∥ rewriter)
+SKIP_REWRITE_WHEN_CLEAN = True  # Don't run the rewriter when the analyzer finds no greenwashing
+RECONCILE = False  # Parallel mode: revise the rewrite against the validator's findings
+PRESCREEN = True  # Rule-based scan first, handing its flagged phrases to the agents
+PRESCREEN_SKIP_CLEAN = False  # End the run with "no greenwashing" when the scan finds no environmental claim
+VALIDATOR_MODE = "routed"  # "routed" (articles fetched up front, one LLM call) or "agent" (ReAct tool loop)
+RESULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "result_cache.sqlite")  # Finished analyses, reused for repeated texts (None = memory only)
+TRACE_MESSAGES = False  # Append every agent's full message history to TRACE_PATH (for debugging)
+TRACE_PATH = "./traces.jsonl"
+
 # ============================================================
-# AGENT NODE FUNCTIONS
+# TRACING
 # ============================================================
 
-def analyze_node(state: AgentState) -> AgentState:
+_trace_lock = threading.Lock()  # Parallel nodes may write at the same time
+
+
+def spill_trace(state: AgentState, stage: str, messages: list):
     """
-    Node 1: Analyze text for greenwashing
+    Append one stage's message history to the trace file (if tracing is on)
     """
-    print("\n🔍 Agent 1: Analyzing for greenwashing...")
-    
-    # Get input text
-    input_text = state["input_text"]
-    
-    # Create message for agent
-    message = HumanMessage(content=f"Analyze this marketing text for greenwashing: {input_text}")
-    
-    # Invoke agent
-    result = analyzer_agent.invoke({"messages": [message]})
-    
-    # Extract agent's response
-    agent_response = result["messages"][-1].content
-    
-    # Parse response (simplified - in production you'd parse JSON properly)
-    # For now, store the full response
-    state["messages"] = result["messages"]
-    state["reasoning"] = agent_response
-    
-    print(f"✅ Analysis complete")
-    
-    return state
+    if not TRACE_MESSAGES:
+        return
+    record = {
+        "trace_id": state.get("trace_id"),
+        "stage": stage,
+        "time": time.time(),
+        "input_text": state["input_text"],
+        "messages": messages_to_dict(messages),
+    }
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _trace_lock:
+        with open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
 
+# ============================================================
+# PRE-SCREEN NODE
+# ============================================================
 
-def validate_node(state: AgentState) -> AgentState:
+def prescreen_node(state: AgentState, skip_clean: bool = PRESCREEN_SKIP_CLEAN) -> dict:
     """
-    Node 2: Find violated articles
+    Node 0: Rule-based scan (no LLM, microseconds)
+    Text the scan finds no environmental claim in goes to the analyzer
+    without hints, or, with skip_clean, gets a final "no greenwashing"
+    verdict here; anything else goes on with its pre-flagged phrases
     """
-    print("\n📋 Agent 2: Identifying violated articles...")
+    scan = prescreen(state["input_text"])
     
-    # Get previous analysis
-    input_text = state["input_text"]
-    previous_analysis = state["reasoning"]
+    if scan["clean"] and not skip_clean:
+        print("🟢 Pre-screen: no environmental claims found, leaving the verdict to the analyzer")
+        return {"prescreen_clean": False, "prescreen_phrases": [], "likely_titles": []}
     
-    # Create message for agent
+    if scan["clean"]:
+        print("🟢 Pre-screen: no environmental claims, skipping the agents")
+        return {
+            "prescreen_clean": True,
+            "is_greenwashing": False,
+            "confidence": 0,
+            "reasoning": "The text makes no environmental claim (rule-based pre-screen).",
+        }
     
-    message = HumanMessage(
-        content=f"""Original text: {input_text}
+    print(f"🔎 Pre-screen flagged: {scan['flagged_phrases']}")
+    return {
+        "prescreen_clean": False,
+        "prescreen_phrases": scan["flagged_phrases"],
+        "likely_titles": scan["likely_titles"],
+    }
 
-    Previous analysis: {previous_analysis}
 
-    Find which SPECIFIC EU directive articles are violated. 
+def route_after_prescreen(state: AgentState) -> str:
+    return END if state.get("prescreen_clean") else "analyzer"
 
-    IMPORTANT: 
-    - Look beyond Articles 3 and 5
-    - If the claim involves comparisons, search for Article 6
-    - If it's about future performance, search for Article 7
-    - If it's about labels, search for Article 10
-    - Search the directive multiple times with different queries if needed
 
-    Be specific and find the EXACT articles that match this particular violation."""
-    )
-    
-    # Invoke agent
-    result = validator_agent.invoke({"messages": [message]})
-    
-    # Extract agent's response
-    agent_response = result["messages"][-1].content
-    
-    # Update state
-    state["messages"].extend(result["messages"])
-    state["article_explanations"] = {"response": agent_response}
-    
-    print(f"✅ Validation complete")
-    
-    return state
+# ============================================================
+# AGENT NODE FUNCTIONS
+# ============================================================
+# Nodes return only the keys they change, so LangGraph can merge the
+# updates of nodes that run in parallel. Each node has a sync and an
+# async version sharing the same request/update helpers.
+# Replies are parsed into the schemas in schemas.py (with a repair call
+# if they don't match) and stored in the typed state fields, so later
+# prompts get compact fields instead of the previous agent's whole reply.
+
+def json_llm():
+    """
+    The LLM in JSON mode, for the single calls that don't use tools
+    """
+    return get_llm().bind(response_format={"type": "json_object"})
 
 
-def rewrite_node(state: AgentState) -> AgentState:
+def analysis_summary(state: AgentState) -> str:
     """
-    Node 3: Generate compliant alternative
+    Compact view of Agent 1's findings for the later prompts
     """
-    print("\n✏️ Agent 3: Generating compliant alternative...")
-    
-    # Get all previous context
-    input_text = state["input_text"]
-    analysis = state["reasoning"]
-    violations = state["article_explanations"]
-    
-    # Create message for agent
-    message = HumanMessage(
-        content=f"Original text: {input_text}\n\nAnalysis: {analysis}\n\nViolations: {violations}\n\nRewrite this to be compliant."
+    return (
+        f"Greenwashing: {'yes' if state['is_greenwashing'] else 'no'} (confidence {state['confidence']}%)\n"
+        f"Flagged phrases: {state['flagged_phrases']}\n"
+        f"Reasoning: {state['reasoning']}"
     )
+
+
+def violations_summary(state: AgentState) -> str:
+    """
+    Compact view of Agent 2's findings for the later prompts
+    """
+    explanations = state.get("article_explanations") or {}
+    lines = [f"- {article}: {explanations.get(article, '')}" for article in state.get("violated_articles", [])]
+    return "\n".join(lines) or "None found"
+
+
+def analyze_request(state: AgentState) -> HumanMessage:
+    """
+    Message sent to Agent 1
+    """
+    content = f"Analyze this marketing text for greenwashing: {state['input_text']}"
+    if state.get("prescreen_phrases"):
+        content += f"\n\nRule-based pre-screen flagged: {state['prescreen_phrases']}"
+    return HumanMessage(content=content)
+
+
+def analyze_update(state: AgentState, result: dict, analysis: Analysis) -> dict:
+    """
+    State update from Agent 1's result
+    """
+    update = {}
+    if analysis is None:
+        # If the reply can't be parsed, assume greenwashing so no stage is skipped
+        analysis = Analysis(is_greenwashing=True, confidence=0, reasoning=result["messages"][-1].content)
+        update["unparsed_stages"] = ["analyzer"]
     
-    # Invoke agent
-    result = rewriter_agent.invoke({"messages": [message]})
-    
-    # Extract agent's response
-    agent_response = result["messages"][-1].content
-    
-    # Update state
-    state["messages"].extend(result["messages"])
-    state["suggested_text"] = agent_response
-    
-    print(f"✅ Rewrite complete")
+    spill_trace(state, "analyzer", result["messages"])
+    print(f"✅ Analysis complete")
     
-    return state
-# ============================================================
-# AGENT NODE FUNCTIONS
-# ============================================================
+    return {
+        **update,
+        "is_greenwashing": analysis.is_greenwashing,
+        "confidence": analysis.confidence,
+        "reasoning": analysis.reasoning,
+        "flagged_phrases": analysis.flagged_phrases,
+    }
+
 
-def analyze_node(state: AgentState) -> AgentState:
+def analyze_node(state: AgentState) -> dict:
     """
     Node 1: Analyze text for greenwashing
     """
     print("\n🔍 Agent 1: Analyzing for greenwashing...")
+    with agent_context():
+        result = get_agent("analyzer").invoke({"messages": [analyze_request(state)]})
+    analysis = parse_with_repair(result["messages"][-1].content, Analysis, json_llm())
+    return analyze_update(state, result, analysis)
+
+
+async def aanalyze_node(state: AgentState) -> dict:
+    print("\n🔍 Agent 1: Analyzing for greenwashing...")
+    with agent_context():
+        result = await get_agent("analyzer").ainvoke({"messages": [analyze_request(state)]})
+    analysis = await aparse_with_repair(result["messages"][-1].content, Analysis, json_llm())
+    return analyze_update(state, result, analysis)
+
+
+def validate_request(state: AgentState) -> HumanMessage:
+    """
+    Message sent to Agent 2
+    """
+    content = f"Original text: {state['input_text']}\n\nPrevious analysis:\n{analysis_summary(state)}"
+    if state.get("likely_titles"):
+        content += f"\n\nLikely relevant articles (rule-based pre-screen): {state['likely_titles']}"
+    return HumanMessage(content=content + "\n\nFind which specific EU directive articles are violated.")
+
+
+def validate_update(state: AgentState, result: dict, validation: Validation) -> dict:
+    """
+    State update from Agent 2's result
+    """
+    update = {}
+    if validation is None:
+        validation = Validation(explanations={"Unparsed reply": result["messages"][-1].content})
+        update["unparsed_stages"] = ["validator"]
     
-    # Get input text
-    input_text = state["input_text"]
-    
-    # Create message for agent
-    message = HumanMessage(content=f"Analyze this marketing text for greenwashing: {input_text}")
-    
-    # Invoke agent
-    result = analyzer_agent.invoke({"messages": [message]})
-    
-    # Extract agent's response
-    agent_response = result["messages"][-1].content
-    
-    # Parse response (simplified - in production you'd parse JSON properly)
-    # For now, store the full response
-    state["messages"] = result["messages"]
-    state["reasoning"] = agent_response
-    
-    print(f"✅ Analysis complete")
+    spill_trace(state, "validator", result["messages"])
+    print(f"✅ Validation complete")
     
-    return state
+    return {
+        **update,
+        "violated_articles": validation.violated_articles,
+        "article_explanations": validation.explanations,
+    }
 
 
-def validate_node(state: AgentState) -> AgentState:
+def validate_node(state: AgentState) -> dict:
     """
     Node 2: Find violated articles
     """
     print("\n📋 Agent 2: Identifying violated articles...")
-    
-    # Get previous analysis
-    input_text = state["input_text"]
-    previous_analysis = state["reasoning"]
-    
-    # Create message for agent
-    message = HumanMessage(
-        content=f"Original text: {input_text}\n\nPrevious analysis: {previous_analysis}\n\nFind which specific EU directive articles are violated."
+    with agent_context():
+        result = get_agent("validator").invoke({"messages": [validate_request(state)]})
+    validation = parse_with_repair(result["messages"][-1].content, Validation, json_llm())
+    return validate_update(state, result, validation)
+
+
+async def avalidate_node(state: AgentState) -> dict:
+    print("\n📋 Agent 2: Identifying violated articles...")
+    with agent_context():
+        result = await get_agent("validator").ainvoke({"messages": [validate_request(state)]})
+    validation = await aparse_with_repair(result["messages"][-1].content, Validation, json_llm())
+    return validate_update(state, result, validation)
+
+
+def route_articles(state: AgentState, vectorstore) -> list:
+    """
+    Article numbers a claim most likely falls under: substantiation (Article 3)
+    always, plus those the pre-screen maps the text and the analyzer's
+    flagged phrases to
+    Headings are resolved against the indexed articles' titles, so the
+    numbers always match the directive that was indexed
+    """
+    flagged = " ".join(str(phrase) for phrase in state.get("flagged_phrases", []))
+    scan = prescreen(f"{state['input_text']} {flagged}")
+    titles = [SUBSTANTIATION, *state.get("likely_titles", []), *scan["likely_titles"]]
+    return get_article_index(vectorstore).numbers_for_titles(titles)
+
+
+class RoutedArticles(BaseRetriever):
+    """
+    The routed validator's article fetch as a retriever, so it reports
+    retriever start/end callbacks (metrics, tracing) like the agents' tool
+    searches do
+    """
+    numbers: list
+    vectorstore: object
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return fetch_articles(self.numbers, self.vectorstore, query=query)
+
+
+def routed_context(state: AgentState, documents: list) -> str:
+    """
+    Fetched articles trimmed to their paragraphs relevant to the claim,
+    within one agent run's token budget
+    """
+    query = " ".join([state["input_text"], *map(str, state.get("flagged_phrases", []))])
+    return ContextAssembler(call_budget=RUN_TOKEN_BUDGET).assemble(query, documents)
+
+
+def routed_validate_messages(state: AgentState, documents: list) -> list:
+    """
+    Messages for the single-call validator, with the fetched articles inlined
+    """
+    return [
+        SystemMessage(content=validator_direct_instructions),
+        HumanMessage(
+            content=f"Original text: {state['input_text']}\n\nPrevious analysis:\n{analysis_summary(state)}\n\n"
+                    f"Directive articles:\n{routed_context(state, documents)}\n\n"
+                    "Find which specific EU directive articles are violated."
+        ),
+    ]
+
+
+def validate_routed_node(state: AgentState) -> dict:
+    """
+    Node 2 (routed mode): fetch the relevant articles in one local lookup,
+    then ask the LLM once instead of letting an agent search turn by turn
+    """
+    print("\n📋 Agent 2: Identifying violated articles...")
+    vectorstore = get_vectorstore()
+    numbers = route_articles(state, vectorstore)
+    documents = RoutedArticles(numbers=numbers, vectorstore=vectorstore).invoke(state["input_text"])
+    messages = routed_validate_messages(state, documents)
+    response = json_llm().invoke(messages)
+    validation = parse_with_repair(response.content, Validation, json_llm())
+    return validate_update(state, {"messages": [*messages, response]}, validation)
+
+
+async def avalidate_routed_node(state: AgentState) -> dict:
+    print("\n📋 Agent 2: Identifying violated articles...")
+    # First call may load the index from disk, keep it off the event loop
+    vectorstore = await aget_vectorstore()
+    numbers = route_articles(state, vectorstore)
+    documents = await RoutedArticles(numbers=numbers, vectorstore=vectorstore).ainvoke(state["input_text"])
+    messages = routed_validate_messages(state, documents)
+    response = await json_llm().ainvoke(messages)
+    validation = await aparse_with_repair(response.content, Validation, json_llm())
+    return validate_update(state, {"messages": [*messages, response]}, validation)
+
+
+def rewrite_request(state: AgentState) -> HumanMessage:
+    """
+    Message sent to Agent 3
+    In parallel mode the rewriter runs alongside the validator and works
+    from the analyzer's flagged phrases instead of the violation details
+    """
+    if state.get("violated_articles"):
+        context = f"Violations:\n{violations_summary(state)}"
+    else:
+        context = f"Flagged phrases: {state.get('flagged_phrases') or state.get('prescreen_phrases', [])}"
+    return HumanMessage(
+        content=f"Original text: {state['input_text']}\n\nAnalysis:\n{analysis_summary(state)}\n\n{context}\n\nRewrite this to be compliant."
     )
+
+
+def rewrite_update(state: AgentState, result: dict, rewrite: Rewrite) -> dict:
+    """
+    State update from Agent 3's result
+    """
+    update = {}
+    if rewrite is None:
+        rewrite = Rewrite(suggested_text=result["messages"][-1].content)
+        update["unparsed_stages"] = ["rewriter"]
     
-    # Invoke agent
-    result = validator_agent.invoke({"messages": [message]})
-    
-    # Extract agent's response
-    agent_response = result["messages"][-1].content
-    
-    # Update state
-    state["messages"].extend(result["messages"])
-    state["article_explanations"] = {"response": agent_response}
-    
-    print(f"✅ Validation complete")
+    spill_trace(state, "rewriter", result["messages"])
+    print(f"✅ Rewrite complete")
     
-    return state
+    return {
+        **update,
+        "suggested_text": rewrite.suggested_text,
+        "changes_made": rewrite.changes_made,
+    }
 
 
-def rewrite_node(state: AgentState) -> AgentState:
+def rewrite_node(state: AgentState) -> dict:
     """
     Node 3: Generate compliant alternative
     """
     print("\n✏️ Agent 3: Generating compliant alternative...")
-    
-    # Get all previous context
-    input_text = state["input_text"]
-    analysis = state["reasoning"]
-    violations = state["article_explanations"]
-    
-    # Create message for agent
-    message = HumanMessage(
-        content=f"Original text: {input_text}\n\nAnalysis: {analysis}\n\nViolations: {violations}\n\nRewrite this to be compliant."
+    with agent_context():
+        result = get_agent("rewriter").invoke({"messages": [rewrite_request(state)]})
+    rewrite = parse_with_repair(result["messages"][-1].content, Rewrite, json_llm())
+    return rewrite_update(state, result, rewrite)
+
+
+async def arewrite_node(state: AgentState) -> dict:
+    print("\n✏️ Agent 3: Generating compliant alternative...")
+    with agent_context():
+        result = await get_agent("rewriter").ainvoke({"messages": [rewrite_request(state)]})
+    rewrite = await aparse_with_repair(result["messages"][-1].content, Rewrite, json_llm())
+    return rewrite_update(state, result, rewrite)
+
+
+def reconcile_request(state: AgentState) -> HumanMessage:
+    """
+    Message for the reconciliation step (single LLM call, no tools)
+    """
+    return HumanMessage(
+        content=f"""Original text: {state["input_text"]}
+
+Violations found:
+{violations_summary(state)}
+
+Proposed rewrite: {state.get("suggested_text", "")}
+Changes made: {state.get("changes_made", [])}
+
+If the proposed rewrite leaves any of these violations unaddressed, revise it.
+Otherwise return it unchanged. Answer with the same JSON format as the proposed rewrite:
+{{"suggested_text": "...", "changes_made": ["..."]}}"""
     )
-    
-    # Invoke agent
-    result = rewriter_agent.invoke({"messages": [message]})
-    
-    # Extract agent's response
-    agent_response = result["messages"][-1].content
-    
-    # Update state
-    state["messages"].extend(result["messages"])
-    state["suggested_text"] = agent_response
-    
-    print(f"✅ Rewrite complete")
-    
-    return state
+
+
+def reconcile_update(state: AgentState, messages: list, rewrite: Rewrite) -> dict:
+    spill_trace(state, "reconciler", messages)
+    print(f"✅ Reconciliation complete")
+    if rewrite is None:
+        return {}  # Keep the rewriter's version
+    return {"suggested_text": rewrite.suggested_text, "changes_made": rewrite.changes_made}
+
+
+def reconcile_node(state: AgentState) -> dict:
+    """
+    Optional node: after a parallel run, check the rewrite against the
+    validator's findings and revise it if needed
+    """
+    print("\n🔗 Reconciling rewrite with violations...")
+    message = reconcile_request(state)
+    response = json_llm().invoke([message])
+    return reconcile_update(state, [message, response], parse_with_repair(response.content, Rewrite, json_llm()))
+
+
+async def areconcile_node(state: AgentState) -> dict:
+    print("\n🔗 Reconciling rewrite with violations...")
+    message = reconcile_request(state)
+    response = await json_llm().ainvoke([message])
+    return reconcile_update(state, [message, response], await aparse_with_repair(response.content, Rewrite, json_llm()))
+
+
+def node(func, afunc):
+    """
+    Wrap a sync/async node pair so the graph runs the matching one under
+    invoke() and ainvoke()
+    """
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+
 # ============================================================
 # BUILD THE WORKFLOW GRAPH
 # ============================================================
 
-def create_workflow():
+def needs_rewrite(state: AgentState) -> bool:
+    """
+    Whether the rewriter has anything to do
+    """
+    return state.get("is_greenwashing", True)
+
+
+def route_after_analysis(state: AgentState) -> list:
+    """
+    Parallel mode fan-out: validator always, rewriter only if needed
+    """
+    if needs_rewrite(state):
+        return ["validator", "rewriter"]
+    print("🟢 No greenwashing found, skipping rewrite")
+    return ["validator"]
+
+
+def route_after_validation(state: AgentState) -> str:
+    """
+    Sequential mode: go on to the rewriter only if needed
+    """
+    if needs_rewrite(state):
+        return "rewriter"
+    print("🟢 No greenwashing found, skipping rewrite")
+    return END
+
+
+def create_workflow(
+    mode=WORKFLOW_MODE,
+    skip_clean=SKIP_REWRITE_WHEN_CLEAN,
+    reconcile=RECONCILE,
+    prescreen=PRESCREEN,
+    validator=VALIDATOR_MODE,
+    prescreen_skip=PRESCREEN_SKIP_CLEAN,
+):
     """
     Create and compile the LangGraph workflow
+    
+    Args:
+        mode: "sequential" runs analyzer → validator → rewriter.
+              "parallel" runs validator and rewriter side by side after the analyzer.
+        skip_clean: Skip the rewriter when the analyzer reports no greenwashing
+        reconcile: Parallel mode only - add a final step that revises the
+                   rewrite against the validator's findings
+        prescreen: Start with the rule-based pre-screen
+        validator: "routed" fetches the likely articles directly and makes one
+                   LLM call; "agent" lets the validator agent search with tools
+        prescreen_skip: End right away for text the pre-screen finds no
+                        environmental claim in (otherwise the analyzer decides)
     """
+    from langgraph.graph import StateGraph
+    
     # Initialize graph
     workflow = StateGraph(AgentState)
     
     # Add nodes (agents)
-    workflow.add_node("analyzer", analyze_node)
-    workflow.add_node("validator", validate_node)
-    workflow.add_node("rewriter", rewrite_node)
+    workflow.add_node("analyzer", node(analyze_node, aanalyze_node))
+    if validator == "routed":
+        workflow.add_node("validator", node(validate_routed_node, avalidate_routed_node))
+    elif validator == "agent":
+        workflow.add_node("validator", node(validate_node, avalidate_node))
+    else:
+        raise ValueError(f"Unknown validator mode: {validator}")
+    workflow.add_node("rewriter", node(rewrite_node, arewrite_node))
     
     # Define edges (flow between agents)
-    workflow.add_edge(START, "analyzer")       # Start → Agent 1
-    workflow.add_edge("analyzer", "validator")  # Agent 1 → Agent 2
-    workflow.add_edge("validator", "rewriter")  # Agent 2 → Agent 3
-    workflow.add_edge("rewriter", END)          # Agent 3 → End
+    if prescreen:
+        workflow.add_node("prescreen", functools.partial(prescreen_node, skip_clean=prescreen_skip))
+        workflow.add_edge(START, "prescreen")  # Start → Pre-screen
+        workflow.add_conditional_edges("prescreen", route_after_prescreen, ["analyzer", END])  # → Agent 1 or End
+    else:
+        workflow.add_edge(START, "analyzer")   # Start → Agent 1
+    
+    if mode == "sequential":
+        workflow.add_edge("analyzer", "validator")  # Agent 1 → Agent 2
+        if skip_clean:
+            workflow.add_conditional_edges("validator", route_after_validation, ["rewriter", END])
+        else:
+            workflow.add_edge("validator", "rewriter")  # Agent 2 → Agent 3
+        workflow.add_edge("rewriter", END)          # Agent 3 → End
+    
+    elif mode == "parallel":
+        # Agent 1 → (Agent 2 ∥ Agent 3)
+        if skip_clean:
+            workflow.add_conditional_edges("analyzer", route_after_analysis, ["validator", "rewriter"])
+        else:
+            workflow.add_edge("analyzer", "validator")
+            workflow.add_edge("analyzer", "rewriter")
+        
+        if reconcile:
+            # Waits for both branches (doesn't run if the rewrite was skipped)
+            workflow.add_node("reconciler", node(reconcile_node, areconcile_node))
+            workflow.add_edge(["validator", "rewriter"], "reconciler")
+            workflow.add_edge("reconciler", END)
+        else:
+            workflow.add_edge("validator", END)
+            workflow.add_edge("rewriter", END)
+    
+    else:
+        raise ValueError(f"Unknown workflow mode: {mode}")
     
     # Compile the graph
     app = workflow.compile()
     
     return app
 
-# Create the app
-app = create_workflow()
+# The app is compiled on first use (see get_app), not at import
+_app = None
+_app_options = None  # create_workflow arguments the app was compiled with
+_app_lock = threading.Lock()
+
+
+def workflow_options() -> dict:
+    """
+    create_workflow arguments from the current workflow settings
+    """
+    return {
+        "mode": WORKFLOW_MODE,
+        "skip_clean": SKIP_REWRITE_WHEN_CLEAN,
+        "reconcile": RECONCILE,
+        "prescreen": PRESCREEN,
+        "validator": VALIDATOR_MODE,
+        "prescreen_skip": PRESCREEN_SKIP_CLEAN,
+    }
+
+
+def get_app():
+    """
+    Lazy load the compiled workflow (built once per process)
+    """
+    global _app, _app_options
+    
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                options = workflow_options()
+                _app = create_workflow(**options)
+                _app_options = options
+    
+    return _app
+
+
+def __getattr__(name):
+    # Keeps `graph.app` / `from graph import app` working
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 # ============================================================
 # HELPER FUNCTION FOR EASY USE
 # ============================================================
 
-def analyze_greenwashing(text: str) -> dict:
+def initial_state(text: str) -> dict:
+    """
+    Empty workflow state for a piece of marketing text
+    """
+    return {
+        "input_text": text,
+        "trace_id": uuid.uuid4().hex,
+        "prescreen_clean": False,
+        "prescreen_phrases": [],
+        "likely_titles": [],
+        "is_greenwashing": False,
+        "confidence": 0,
+        "reasoning": "",
+        "flagged_phrases": [],
+        "violated_articles": [],
+        "article_explanations": {},
+        "suggested_text": "",
+        "changes_made": [],
+        "unparsed_stages": [],
+    }
+
+
+def extract_result(text: str, final_state: dict) -> dict:
+    """
+    Pick the user-facing results out of the final workflow state
+    """
+    return {
+        "original_text": text,
+        "analysis": {
+            "is_greenwashing": final_state.get("is_greenwashing", False),
+            "confidence": final_state.get("confidence", 0),
+            "reasoning": final_state.get("reasoning", ""),
+            "flagged_phrases": final_state.get("flagged_phrases", []),
+        },
+        "violations": {
+            "violated_articles": final_state.get("violated_articles", []),
+            "explanations": final_state.get("article_explanations", {}),
+        },
+        "suggestion": {
+            "suggested_text": final_state.get("suggested_text", ""),
+            "changes_made": final_state.get("changes_made", []),
+        },
+    }
+
+
+# ============================================================
+# RESULT MEMOIZATION
+# ============================================================
+# Results are stored under the normalized text plus a fingerprint of
+# everything that shapes them, so editing a prompt, switching model or
+# re-indexing the directive never serves a stale analysis
+
+_result_cache = None  # Opened on first use (see get_result_cache), not at import
+_result_cache_lock = threading.Lock()
+_in_flight = {}  # key -> task of an analysis currently running (async path)
+_in_flight_sync = {}  # key -> future of an analysis currently running (sync path)
+_in_flight_lock = threading.Lock()
+
+
+def get_result_cache() -> QueryCache:
+    """
+    Lazy load the result cache
+    """
+    global _result_cache
+    
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = QueryCache(ttl=None, path=RESULT_CACHE_PATH)
+    
+    return _result_cache
+
+
+@functools.lru_cache(maxsize=16)
+def _fingerprint(*parts) -> str:
+    schemas = json.dumps([schema.model_json_schema() for schema in (Analysis, Validation, Rewrite)])
+    return hashlib.sha256("\x1f".join([*parts, schemas]).encode("utf-8")).hexdigest()[:16]
+
+
+def workflow_fingerprint() -> str:
+    """
+    Hash of the prompts, model settings, workflow options (those the app
+    was compiled with, once it is), retrieval settings and token budgets,
+    output schemas and index version
+    Needs no LLM client. The index version is the loaded store's, so the
+    store is loaded (and synced with the source PDFs) first: async callers
+    should await aget_vectorstore() before calling this
+    """
+    get_vectorstore()
+    model_name, temperature = llm_settings()
+    options = _app_options if _app is not None else workflow_options()
+    budgets = ContextAssembler()  # The defaults every agent run uses
+    return _fingerprint(
+        analyzer_instructions,
+        validator_instructions,
+        validator_direct_instructions,
+        rewriter_instructions,
+        str(model_name),
+        str(temperature),
+        json.dumps(options, sort_keys=True),
+        f"{rag.SEARCH_MODE}/{tools.SEARCH_K}/{budgets.run_budget}/{budgets.call_budget}/{budgets.chunk_budget}",
+        str(get_loaded_index_version()),
+    )
+
+
+def result_cache_key(text: str) -> str:
+    """
+    Cache key for a text: texts differing only in case/whitespace share it
+    """
+    normalized = normalize_text(text).lower()
+    return f"{workflow_fingerprint()}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+
+def cached_result(text: str, key: str):
+    """
+    Stored result for a cache key, re-labelled with this exact text
+    """
+    return _from_cache_value(text, get_result_cache().get(key))
+
+
+async def acached_result(text: str, key: str):
+    """
+    Async cached_result (the on-disk lookup runs in a worker thread)
+    """
+    return _from_cache_value(text, await get_result_cache().aget(key))
+
+
+def _from_cache_value(text: str, value):
+    if value is None:
+        return None
+    return dict(json.loads(value), original_text=text)
+
+
+def store_result(text: str, result: dict, final_state: dict):
+    """
+    Cache a finished analysis, unless a stage's reply couldn't be parsed
+    (its fallback output shouldn't be served again)
+    The key is computed again, so it has the version of the index the run
+    actually used
+    """
+    if _cacheable(final_state):
+        get_result_cache().put(result_cache_key(text), json.dumps(result))
+
+
+async def astore_result(text: str, result: dict, final_state: dict):
+    """
+    Async store_result (the on-disk write runs in a worker thread)
+    """
+    if _cacheable(final_state):
+        await get_result_cache().aput(result_cache_key(text), json.dumps(result))
+
+
+def _cacheable(final_state: dict) -> bool:
+    if final_state.get("unparsed_stages"):
+        print(f"⚠️ Not caching: unparsed reply from {final_state['unparsed_stages']}")
+        return False
+    return True
+
+
+def run_shared(key: str, text: str, callbacks: list = None) -> dict:
+    """
+    Run the workflow for a text, sharing the run with any other thread
+    already analyzing the same cache key (only that caller's callbacks see it)
+    
+    Returns:
+        Final workflow state
+    """
+    with _in_flight_lock:
+        future = _in_flight_sync.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight_sync[key] = concurrent.futures.Future()
+    
+    if not owner:
+        print("⏳ Same text already being analyzed, waiting for its result")
+        return future.result()
+    
+    try:
+        final_state = get_app().invoke(initial_state(text), config={"callbacks": callbacks})
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(final_state)
+        return final_state
+    finally:
+        with _in_flight_lock:
+            del _in_flight_sync[key]
+
+
+def get_result_cache_stats() -> dict:
+    return get_result_cache().stats()
+
+
+def analyze_greenwashing(text: str, use_cache: bool = True, callbacks: list = None) -> dict:
     """
     Main function to analyze marketing text
     
     Args:
         text: Marketing text to analyze
+        use_cache: Reuse the stored result of an identical earlier analysis
+        callbacks: LangChain callbacks for the run (e.g. metrics.MetricsCallback)
         
     Returns:
         Dictionary with analysis, violations, and suggestions
+    
+    Concurrent calls (threads) for the same (normalized) text share one
+    workflow run, as in analyze_greenwashing_async.
     """
     print(f"\n{'='*60}")
     print(f"ANALYZING: {text}")
     print(f"{'='*60}")
     
-    # Create initial state
-    initial_state = {
-        "input_text": text,
-        "messages": [],
-        "is_greenwashing": False,
-        "confidence": 0,
-        "reasoning": "",
-        "flagged_phrases": [],
-        "violated_articles": [],
-        "article_explanations": {},
-        "suggested_text": "",
-        "changes_made": []
-    }
-    
-    # Run the workflow
-    final_state = app.invoke(initial_state)
+    key = result_cache_key(text) if use_cache else None
+    result = cached_result(text, key) if use_cache else None
     
-    # Extract results
-    result = {
-        "original_text": text,
-        "analysis": final_state.get("reasoning", ""),
-        "violations": final_state.get("article_explanations", {}),
-        "suggestion": final_state.get("suggested_text", "")
-    }
+    if result is not None:
+        print("⚡ Same text already analyzed, reusing the stored result")
+    elif use_cache:
+        # Run the workflow
+        final_state = run_shared(key, text, callbacks)
+        result = extract_result(text, final_state)
+        store_result(text, result, final_state)
+    else:
+        final_state = get_app().invoke(initial_state(text), config={"callbacks": callbacks})
+        result = extract_result(text, final_state)
     
     print(f"\n{'='*60}")
     print("✅ ANALYSIS COMPLETE")
@@ -309,6 +847,180 @@ def analyze_greenwashing(text: str) -> dict:
     return result
 
 
+async def analyze_greenwashing_async(text: str, use_cache: bool = True, callbacks: list = None) -> dict:
+    """
+    Async version of analyze_greenwashing
+    Agents, tool calls and retrieval all await instead of blocking, so many
+    texts can be analyzed concurrently on one event loop, e.g.
+    await asyncio.gather(*(analyze_greenwashing_async(t) for t in texts))
+    Concurrent calls for the same (normalized) text share one workflow run
+    (only the first caller's callbacks see it).
+    """
+    config = {"callbacks": callbacks}
+    if not use_cache:
+        final_state = await get_app().ainvoke(initial_state(text), config=config)
+        return extract_result(text, final_state)
+    
+    # The key includes the index version, so load (and sync) the store first
+    await aget_vectorstore()
+    key = result_cache_key(text)
+    result = await acached_result(text, key)
+    if result is not None:
+        return result
+    
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(get_app().ainvoke(initial_state(text), config=config))
+        _in_flight[key] = task
+        try:
+            final_state = await task
+        finally:
+            del _in_flight[key]
+        result = extract_result(text, final_state)
+        await astore_result(text, result, final_state)
+        return result
+    
+    # Another caller is already analyzing this text, wait for its result
+    final_state = await asyncio.shield(task)
+    return extract_result(text, final_state)
+
+
+# ============================================================
+# STREAMING
+# ============================================================
+# Results are yielded section by section as each agent finishes, so a UI
+# can show the verdict while the validator and rewriter are still working
+
+STREAM_SECTIONS = {  # Node -> result section its update completes
+    "prescreen": "analysis",
+    "analyzer": "analysis",
+    "validator": "violations",
+    "rewriter": "suggestion",
+    "reconciler": "suggestion",
+}
+STREAM_TOKEN_STAGES = ("rewriter", "reconciler")  # Stages whose suggested text is streamed as it is written
+
+
+class StreamTracker:
+    """
+    Turns LangGraph stream output ("updates" and "messages" modes) into
+    result events, merging node updates into the state as they arrive
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.state = initial_state(text)
+        self._replies = {}  # stage -> (message id, text streamed so far)
+        self._partial = ""
+
+    def events(self, mode: str, chunk):
+        if mode == "updates":
+            for name, update in chunk.items():
+                if not update:
+                    continue
+                # Applied like the graph's reducer: parallel stages both add to it
+                unparsed = self.state["unparsed_stages"] + update.get("unparsed_stages", [])
+                self.state.update(update, unparsed_stages=unparsed)
+                # An unflagged pre-screen only hands over to the analyzer
+                if name == "prescreen" and not update.get("prescreen_clean"):
+                    continue
+                section = STREAM_SECTIONS.get(name)
+                if section:
+                    yield section, extract_result(self.text, self.state)[section]
+        
+        elif mode == "messages":
+            message, metadata = chunk
+            stage = metadata.get("langgraph_checkpoint_ns", "").split(":", 1)[0]
+            if stage not in STREAM_TOKEN_STAGES or not isinstance(message, AIMessageChunk):
+                return
+            if not isinstance(message.content, str):
+                return
+            
+            reply_id, reply = self._replies.get(stage, (None, ""))
+            if reply_id != message.id:
+                reply = ""  # A new LLM call (next ReAct turn or a repair)
+            reply += message.content
+            self._replies[stage] = (message.id, reply)
+            
+            # The reply is JSON: show only the suggested text, as far as it got
+            partial = partial_json_string(reply, "suggested_text")
+            if partial and partial != self._partial:
+                self._partial = partial
+                yield "suggestion_text", partial
+
+    def result(self) -> dict:
+        return extract_result(self.text, self.state)
+
+
+def cached_events(result: dict):
+    return [(section, result[section]) for section in ("analysis", "violations", "suggestion")] + [("result", result)]
+
+
+def stream_greenwashing(text: str, use_cache: bool = True, callbacks: list = None):
+    """
+    Analyze marketing text, yielding results as each agent finishes
+    
+    Args:
+        text: Marketing text to analyze
+        use_cache: Reuse the stored result of an identical earlier analysis
+        callbacks: LangChain callbacks for the run
+    
+    Yields:
+        (kind, payload) tuples:
+        - ("analysis", dict): the verdict (pre-screen or analyzer)
+        - ("violations", dict): the validator's findings
+        - ("suggestion_text", str): the suggested text so far, while the
+          rewriter is writing it
+        - ("suggestion", dict): the finished rewrite
+        - ("result", dict): everything, as returned by analyze_greenwashing
+        Sections that don't run (e.g. the rewrite of compliant text) only
+        arrive with the final result.
+    """
+    key = result_cache_key(text) if use_cache else None
+    result = cached_result(text, key) if use_cache else None
+    if result is not None:
+        yield from cached_events(result)
+        return
+    
+    tracker = StreamTracker(text)
+    for mode, chunk in get_app().stream(
+        dict(tracker.state), config={"callbacks": callbacks}, stream_mode=["updates", "messages"]
+    ):
+        yield from tracker.events(mode, chunk)
+    
+    result = tracker.result()
+    if use_cache:
+        store_result(text, result, tracker.state)
+    yield "result", result
+
+
+async def astream_greenwashing(text: str, use_cache: bool = True, callbacks: list = None):
+    """
+    Async version of stream_greenwashing (same events)
+    """
+    if use_cache:
+        # The key includes the index version, so load (and sync) the store first
+        await aget_vectorstore()
+    key = result_cache_key(text) if use_cache else None
+    result = await acached_result(text, key) if use_cache else None
+    if result is not None:
+        for event in cached_events(result):
+            yield event
+        return
+    
+    tracker = StreamTracker(text)
+    async for mode, chunk in get_app().astream(
+        dict(tracker.state), config={"callbacks": callbacks}, stream_mode=["updates", "messages"]
+    ):
+        for event in tracker.events(mode, chunk):
+            yield event
+    
+    result = tracker.result()
+    if use_cache:
+        await astore_result(text, result, tracker.state)
+    yield "result", result
+
+
 # ============================================================
 # TEST THE WORKFLOW
 # ============================================================
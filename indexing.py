@@ -0,0 +1,435 @@
+"""
+Indexing Pipeline
+1. Split chunks into batches
+2. Embed batches across a bounded worker pool (with backoff on rate limits)
+3. Bulk-insert the vectors into the vector store
+"""
+
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+EMBED_BATCH_SIZE = 64  # Chunks sent to the embedding API per request
+EMBED_MAX_WORKERS = 4  # Concurrent embedding requests
+EMBED_MAX_RETRIES = 5  # Retries per batch on rate-limit errors
+EMBED_BACKOFF_SECONDS = 1.0  # First retry delay, doubled on each retry
+INSERT_BATCH_SIZE = 1000  # Vectors written to the store per call (Chroma caps batch size)
+STREAM_QUEUE_SIZE = 8  # Batches buffered between streaming pipeline stages
+
+_DONE = object()  # End-of-stream marker passed between pipeline stages
+
+
+def is_rate_limit_error(error):
+    """
+    Detect rate-limit errors without depending on a specific client library
+    """
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+def chunk_id(chunk):
+    """
+    Deterministic id for a chunk, so re-inserting the same chunk overwrites it
+
+    Args:
+        chunk: Document chunk
+
+    Returns:
+        Hex digest of the chunk source, page and content
+    """
+    source = str(chunk.metadata.get("source", ""))
+    page = str(chunk.metadata.get("page", ""))
+    payload = "\x1f".join([source, page, chunk.page_content])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def embed_batch(embeddings, texts, max_retries=EMBED_MAX_RETRIES, backoff=EMBED_BACKOFF_SECONDS):
+    """
+    Embed one batch, retrying with exponential backoff on rate-limit errors
+
+    Returns:
+        Tuple of (vectors, number of retries used)
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts), attempt
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limit_error(e):
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random() / 2)
+            print(f"⚠️ Rate limited, retrying batch in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def add_embedded_chunks(vectorstore, chunks, vectors, ids=None, batch_size=INSERT_BATCH_SIZE):
+    """
+    Bulk-insert precomputed vectors into a Chroma store (no re-embedding)
+
+    Args:
+        vectorstore: Chroma vector store
+        chunks: Document chunks
+        vectors: Embedding for each chunk
+        ids: Optional ids (defaults to chunk_id of each chunk)
+    """
+    if ids is None:
+        ids = [chunk_id(chunk) for chunk in chunks]
+
+    for start in range(0, len(chunks), batch_size):
+        end = start + batch_size
+        vectorstore._collection.upsert(
+            ids=ids[start:end],
+            embeddings=vectors[start:end],
+            documents=[chunk.page_content for chunk in chunks[start:end]],
+            metadatas=[chunk.metadata for chunk in chunks[start:end]],
+        )
+
+
+def index_stream(
+    chunks,
+    vectorstore,
+    embeddings,
+    batch_size=EMBED_BATCH_SIZE,
+    max_workers=EMBED_MAX_WORKERS,
+    max_retries=EMBED_MAX_RETRIES,
+    backoff=EMBED_BACKOFF_SECONDS,
+    queue_size=STREAM_QUEUE_SIZE,
+):
+    """
+    Stream chunks through embedding into the store
+
+    Pipeline: reader thread -> batch queue -> embedding workers -> result queue
+    -> writer (this thread). Both queues are bounded, so a slow stage applies
+    back-pressure to the reader and at most a few batches are held in memory
+    no matter how long the input is.
+
+    Args:
+        chunks: Iterable (or generator) of document chunks
+        vectorstore: Chroma vector store to insert into
+        embeddings: Embedder used for the chunks
+        queue_size: Batches buffered between stages
+
+    Returns:
+        Dict of indexing statistics (chunks, batches, retries, seconds,
+        chunks_per_sec, first_insert_seconds)
+    """
+    start_time = time.perf_counter()
+
+    batches = queue.Queue(maxsize=queue_size)
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        # Identical chunks share an id, so keep only the first copy
+        seen = set()
+        batch = []
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                cid = chunk_id(chunk)
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                batch.append((cid, chunk))
+                if len(batch) == batch_size:
+                    batches.put(batch)
+                    batch = []
+            if batch and not stop.is_set():
+                batches.put(batch)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(max_workers):
+                batches.put(_DONE)
+
+    def embed():
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                break
+            if stop.is_set():
+                continue  # Keep draining so the reader never blocks
+            try:
+                texts = [chunk.page_content for _, chunk in batch]
+                vectors, batch_retries = embed_batch(embeddings, texts, max_retries, backoff)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+                continue
+            results.put((batch, vectors, batch_retries))
+        results.put(_DONE)
+
+    threads = [threading.Thread(target=read, daemon=True)]
+    threads += [threading.Thread(target=embed, daemon=True) for _ in range(max_workers)]
+    for thread in threads:
+        thread.start()
+
+    stats = {"chunks": 0, "batches": 0, "retries": 0, "first_insert_seconds": None}
+    finished = 0
+
+    while finished < max_workers:
+        item = results.get()
+        if item is _DONE:
+            finished += 1
+            continue
+        if stop.is_set():
+            continue
+
+        batch, vectors, batch_retries = item
+        try:
+            add_embedded_chunks(
+                vectorstore,
+                [chunk for _, chunk in batch],
+                vectors,
+                ids=[cid for cid, _ in batch],
+            )
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            continue
+
+        if stats["first_insert_seconds"] is None:
+            stats["first_insert_seconds"] = time.perf_counter() - start_time
+        stats["chunks"] += len(batch)
+        stats["batches"] += 1
+        stats["retries"] += batch_retries
+        print(f"⏳ Indexed {stats['chunks']} chunks so far")
+
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    seconds = time.perf_counter() - start_time
+    stats["seconds"] = seconds
+    stats["chunks_per_sec"] = stats["chunks"] / seconds if seconds else 0.0
+
+    print(f"✅ Indexed {stats['chunks']} chunks in {seconds:.2f}s ({stats['chunks_per_sec']:.1f} chunks/sec)")
+
+    return stats
+
+
+def index_chunks(
+    chunks,
+    vectorstore,
+    embeddings,
+    batch_size=EMBED_BATCH_SIZE,
+    max_workers=EMBED_MAX_WORKERS,
+    max_retries=EMBED_MAX_RETRIES,
+    backoff=EMBED_BACKOFF_SECONDS,
+):
+    """
+    Embed chunks in concurrent batches and bulk-insert them into the store
+
+    Args:
+        chunks: List of document chunks
+        vectorstore: Chroma vector store to insert into
+        embeddings: Embedder used for the chunks
+
+    Returns:
+        Dict of indexing statistics (chunks, batches, retries, seconds, chunks_per_sec)
+    """
+    return index_stream(
+        chunks,
+        vectorstore,
+        embeddings,
+        batch_size=batch_size,
+        max_workers=max_workers,
+        max_retries=max_retries,
+        backoff=backoff,
+    )
+
+
+# ============================================================
+# INCREMENTAL RE-INDEXING
+# ============================================================
+
+MANIFEST_FILE = "manifest.json"  # Stored inside the vector database directory
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file's bytes, read in blocks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(persist_directory):
+    return os.path.join(persist_directory, MANIFEST_FILE)
+
+
+def load_manifest(persist_directory):
+    """
+    Load the index manifest
+
+    Returns:
+        Manifest dict, or None if the index has no manifest yet
+    """
+    path = manifest_path(persist_directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_directory, manifest):
+    """
+    Atomically write the manifest, stamping it with a new index version
+    The version is a hash of every indexed chunk id, so it only changes
+    when the index content changes
+    """
+    all_ids = sorted(
+        entry["id"]
+        for source in manifest["sources"].values()
+        for entry in source["chunks"]
+    )
+    manifest["version"] = hashlib.sha256("\n".join(all_ids).encode("utf-8")).hexdigest()[:16]
+
+    os.makedirs(persist_directory, exist_ok=True)
+    path = manifest_path(persist_directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def get_index_version(persist_directory):
+    """
+    Current index version, or None if the index has no manifest
+    """
+    manifest = load_manifest(persist_directory)
+    return manifest.get("version") if manifest else None
+
+
+def sources_changed(sources, persist_directory, chunker_version=None):
+    """
+    Whether the index is out of date with the source files
+    (missing manifest, files added/removed, any file hash changed, or the
+    index was built by another chunker version)
+    """
+    manifest = load_manifest(persist_directory)
+    if manifest is None or manifest.get("chunker_version") != chunker_version:
+        return True
+
+    keys = {os.path.abspath(path): path for path in sources}
+    if set(keys) != set(manifest["sources"]):
+        return True
+
+    return any(
+        manifest["sources"][key]["file_hash"] != file_hash(path)
+        for key, path in keys.items()
+    )
+
+
+def sync_index(sources, vectorstore, embeddings, chunker, persist_directory, chunker_version=None):
+    """
+    Bring the vector store in line with the source files, touching only what changed
+
+    Unchanged files (same hash) are skipped without being parsed. For changed
+    or new files only chunks whose id is not indexed yet are embedded, and
+    chunks that disappeared are deleted. Files dropped from `sources` have
+    all their chunks deleted.
+
+    Args:
+        sources: List of source file paths
+        vectorstore: Chroma vector store
+        embeddings: Embedder used for new chunks
+        chunker: Function path -> iterable of document chunks (may be a generator)
+        persist_directory: Vector database directory (holds the manifest)
+        chunker_version: Version of `chunker`; when it differs from the one
+                         that built the index every file is re-chunked
+
+    Returns:
+        Dict with counts of added, removed and unchanged chunks and skipped files
+    """
+    start_time = time.perf_counter()
+
+    manifest = load_manifest(persist_directory)
+    if manifest is None:
+        # Index built before manifests existed: diff against what is stored
+        existing_ids = set(vectorstore._collection.get(include=[])["ids"])
+        manifest = {"sources": {}}
+    else:
+        existing_ids = {
+            entry["id"]
+            for source in manifest["sources"].values()
+            for entry in source["chunks"]
+        }
+
+    # Another chunker may produce other chunks from the same file
+    rechunk = manifest.get("chunker_version") != chunker_version
+
+    stats = {"added": 0, "removed": 0, "unchanged": 0, "files_skipped": 0}
+    new_sources = {}
+    scheduled = set()
+
+    for path in sources:
+        key = os.path.abspath(path)
+        current_hash = file_hash(path)
+        previous = manifest["sources"].get(key)
+
+        if previous is not None and previous["file_hash"] == current_hash and not rechunk:
+            new_sources[key] = previous
+            stats["files_skipped"] += 1
+            stats["unchanged"] += len(previous["chunks"])
+            continue
+
+        print(f"🔄 Re-indexing changed file: {path}")
+        entries = []
+        seen = set()
+
+        def new_chunks(path=path, entries=entries, seen=seen):
+            # Records every chunk in the manifest while streaming only the
+            # ones that are not indexed yet on to the embedder
+            for chunk in chunker(path):
+                cid = chunk_id(chunk)
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                entries.append({
+                    "id": cid,
+                    "page": chunk.metadata.get("page"),
+                    "chunk_hash": hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest(),
+                })
+                if cid in existing_ids:
+                    stats["unchanged"] += 1
+                elif cid not in scheduled:
+                    scheduled.add(cid)
+                    yield chunk
+
+        result = index_stream(new_chunks(), vectorstore, embeddings)
+        stats["added"] += result["chunks"]
+        new_sources[key] = {"file_hash": current_hash, "chunks": entries}
+
+    # Anything indexed but no longer produced by any source is stale
+    wanted_ids = {entry["id"] for source in new_sources.values() for entry in source["chunks"]}
+    stale_ids = sorted(existing_ids - wanted_ids)
+
+    if stale_ids:
+        for start in range(0, len(stale_ids), INSERT_BATCH_SIZE):
+            vectorstore._collection.delete(ids=stale_ids[start:start + INSERT_BATCH_SIZE])
+        stats["removed"] = len(stale_ids)
+
+    manifest["sources"] = new_sources
+    manifest["chunker_version"] = chunker_version
+    save_manifest(persist_directory, manifest)
+
+    stats["seconds"] = time.perf_counter() - start_time
+    print(
+        f"✅ Index in sync: +{stats['added']} added, -{stats['removed']} removed, "
+        f"{stats['unchanged']} unchanged ({stats['seconds']:.2f}s)"
+    )
+
+    return stats
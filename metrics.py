@@ -0,0 +1,249 @@
+"""
+Workflow Metrics
+LangChain callback that records, per graph stage:
+- wall time of each graph node
+- every LLM call (latency, tokens in/out, estimated cost)
+- every tool call (search_eu_directive latency)
+- every retrieval outside a tool (the routed validator's article fetch)
+plus embedding API calls and cache hits over the run, and exports it all
+as JSONL
+
+Usage:
+    metrics = MetricsCallback()
+    analyze_greenwashing(text, callbacks=[metrics])
+    print(metrics.summary())
+    metrics.to_jsonl("traces/metrics.jsonl")
+"""
+
+import json
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# USD per 1M tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+def counters():
+    """
+    Process-wide cache and embedding counters
+    Embedding cache misses are the texts actually sent to the embedding API
+    """
+    # Imported here so the callback itself can be used without loading the pipeline
+    import graph
+    import rag
+    import tools
+
+    snapshot = {
+        "query_cache_hits": tools.get_query_cache_stats()["hits"],
+        "result_cache_hits": graph.get_result_cache_stats()["hits"],
+        "embedding_cache_hits": 0,
+        "embedding_api_texts": 0,
+    }
+    if rag._embeddings is not None:
+        stats = rag._embeddings.stats()
+        snapshot["embedding_cache_hits"] = stats["hits"]
+        snapshot["embedding_api_texts"] = stats["misses"]
+    return snapshot
+
+
+def _stage(metadata):
+    # "validator:<id>|agent:<id>" -> "validator"
+    namespace = (metadata or {}).get("langgraph_checkpoint_ns", "")
+    return namespace.split(":", 1)[0] or None
+
+
+def _usage(response):
+    """
+    (input tokens, output tokens) of an LLM result
+    """
+    tokens_in = tokens_out = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                tokens_in += usage.get("input_tokens", 0)
+                tokens_out += usage.get("output_tokens", 0)
+
+    if not (tokens_in or tokens_out):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        tokens_in = usage.get("prompt_tokens", 0)
+        tokens_out = usage.get("completion_tokens", 0)
+
+    return tokens_in, tokens_out
+
+
+def cost_usd(model, tokens_in, tokens_out):
+    """
+    Estimated cost of a call (0 for unknown models)
+    """
+    for name, (price_in, price_out) in MODEL_PRICES.items():
+        if model and model.startswith(name):
+            return (tokens_in * price_in + tokens_out * price_out) / 1_000_000
+    return 0.0
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """
+    Collects timing and token events for one or more workflow runs
+    Pass it in the callbacks of invoke/ainvoke (or analyze_greenwashing);
+    safe to share between threads
+    """
+
+    def __init__(self, label=None, track_counters=True):
+        self.label = label
+        self.events = []
+        self._open = {}  # run_id -> (event dict, start time)
+        self._lock = threading.Lock()
+        self._counters = counters() if track_counters else None
+
+    def _start(self, run_id, event):
+        event["label"] = self.label
+        event["start"] = time.time()
+        with self._lock:
+            self._open[run_id] = (event, time.perf_counter())
+
+    def _end(self, run_id, **fields):
+        with self._lock:
+            started = self._open.pop(run_id, None)
+            if started is None:
+                return
+            event, start = started
+            event["seconds"] = time.perf_counter() - start
+            event.update(fields)
+            self.events.append(event)
+
+    # Graph nodes
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        name = kwargs.get("name")
+        namespace = metadata.get("langgraph_checkpoint_ns", "")
+        # Only the workflow's own nodes, not the steps inside each agent
+        if name and name == metadata.get("langgraph_node") and "|" not in namespace and not name.startswith("__"):
+            self._start(run_id, {"type": "node", "stage": name, "name": name})
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    # LLM calls
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, invocation_params=None, **kwargs):
+        metadata = metadata or {}
+        params = invocation_params or {}
+        model = metadata.get("ls_model_name") or params.get("model_name") or params.get("model") or params.get("_type")
+        self._start(run_id, {"type": "llm", "stage": _stage(metadata), "name": model})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        tokens_in, tokens_out = _usage(response)
+        with self._lock:
+            model = self._open[run_id][0]["name"] if run_id in self._open else None
+        self._end(
+            run_id,
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+            cost_usd=cost_usd(model, tokens_in, tokens_out),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    # Tool calls
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name")
+        self._start(run_id, {"type": "tool", "stage": _stage(metadata), "name": name, "input": input_str})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    # Retrievals
+    def on_retriever_start(self, serialized, query, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        self._start(run_id, {"type": "retrieval", "stage": _stage(metadata), "name": name, "input": query})
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    def counter_deltas(self):
+        """
+        Change in the process-wide counters since this callback was created
+        (includes other runs happening at the same time)
+        """
+        if self._counters is None:
+            return {}
+        now = counters()
+        return {key: now[key] - self._counters[key] for key in now}
+
+    def summary(self):
+        """
+        Totals per stage and overall
+
+        Returns:
+            Dict with "stages" (stage -> seconds, llm_calls, llm_seconds,
+            tool_calls, tool_seconds, retrieval_calls, retrieval_seconds,
+            tokens_in, tokens_out, cost_usd),
+            "total" (same keys plus wall_seconds, first event to last) and
+            "counters" (see counter_deltas)
+        """
+        empty = {
+            "seconds": 0.0, "llm_calls": 0, "llm_seconds": 0.0, "tool_calls": 0,
+            "tool_seconds": 0.0, "retrieval_calls": 0, "retrieval_seconds": 0.0,
+            "tokens_in": 0, "tokens_out": 0, "cost_usd": 0.0,
+        }
+        stages = {}
+        total = dict(empty)
+
+        with self._lock:
+            events = list(self.events)
+
+        for event in events:
+            stage = stages.setdefault(event["stage"] or "other", dict(empty))
+            for totals in (stage, total):
+                if event["type"] == "node":
+                    totals["seconds"] += event["seconds"]
+                elif event["type"] == "llm":
+                    totals["llm_calls"] += 1
+                    totals["llm_seconds"] += event["seconds"]
+                    totals["tokens_in"] += event.get("tokens_in", 0)
+                    totals["tokens_out"] += event.get("tokens_out", 0)
+                    totals["cost_usd"] += event.get("cost_usd", 0.0)
+                elif event["type"] == "tool":
+                    totals["tool_calls"] += 1
+                    totals["tool_seconds"] += event["seconds"]
+                elif event["type"] == "retrieval":
+                    totals["retrieval_calls"] += 1
+                    totals["retrieval_seconds"] += event["seconds"]
+
+        if events:
+            first = min(event["start"] for event in events)
+            last = max(event["start"] + event["seconds"] for event in events)
+            total["wall_seconds"] = last - first
+
+        return {"stages": stages, "total": total, "counters": self.counter_deltas()}
+
+    def to_jsonl(self, path):
+        """
+        Append every recorded event, then a summary line, to a JSONL file
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            events = list(self.events)
+
+        with open(path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            f.write(json.dumps({"type": "summary", "label": self.label, **self.summary()}, default=str) + "\n")
@@ -0,0 +1,243 @@
+"""
+NumPy Vector Store
+Lightweight in-process alternative to Chroma for small corpora
+- Normalized embeddings live in a memory-mapped .npy matrix, so several
+  processes share the same pages through the OS cache
+- Texts and metadata live in a sidecar JSON file
+- Top-k is a single matrix-vector product
+- Each export is written to its own generation subdirectory and published
+  by swapping one pointer file, so readers never mix two exports
+"""
+
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.json"
+POINTER_FILE = "CURRENT"  # Name of the generation subdirectory readers should load
+KEEP_GENERATIONS = 2  # Current export plus the previous one (still mapped by older readers)
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def write_index(directory, ids, texts, metadatas, vectors, version=None):
+    """
+    Atomically write an index directory
+    The matrix and sidecar go into a new generation subdirectory, then the
+    pointer file is replaced in one os.replace. A reader sees either the
+    old export or the new one, never the vectors of one with the
+    documents of the other.
+
+    Args:
+        directory: Target directory
+        ids: Chunk ids
+        texts: Chunk texts
+        metadatas: Chunk metadata dicts
+        vectors: Embeddings (normalized on write)
+        version: Index version the export was made from
+    """
+    generation = f"{version or 'index'}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+
+    matrix = _normalize(vectors) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+    with open(os.path.join(path, VECTORS_FILE), "wb") as f:
+        np.save(f, matrix)
+
+    sidecar = {
+        "version": version,
+        "ids": list(ids),
+        "texts": list(texts),
+        "metadatas": [dict(metadata or {}) for metadata in metadatas],
+    }
+    with open(os.path.join(path, DOCUMENTS_FILE), "w", encoding="utf-8") as f:
+        json.dump(sidecar, f)
+
+    # Publish: the only step readers can observe
+    pointer = os.path.join(directory, POINTER_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(pointer + ".tmp", pointer)
+
+    _remove_old_generations(directory, generation)
+
+
+def _remove_old_generations(directory, current):
+    generations = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_dir() and entry.name != current),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in generations[KEEP_GENERATIONS - 1:]:
+        # Files still mapped by a reader stay readable on POSIX; elsewhere
+        # the directory is simply left for the next export to remove
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def current_path(directory):
+    """
+    Directory holding the export readers should load, or None if there is
+    no index (indexes written before generations existed are read in place)
+    """
+    pointer = os.path.join(directory, POINTER_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, encoding="utf-8") as f:
+            return os.path.join(directory, f.read().strip())
+    if os.path.exists(os.path.join(directory, DOCUMENTS_FILE)):
+        return directory
+    return None
+
+
+def index_exists(directory):
+    return current_path(directory) is not None
+
+
+def index_version(directory):
+    """
+    Version recorded in an index directory, or None if there is no index
+    """
+    path = current_path(directory)
+    if path is None:
+        return None
+    with open(os.path.join(path, DOCUMENTS_FILE), encoding="utf-8") as f:
+        return json.load(f).get("version")
+
+
+def export_from_chroma(vectorstore, directory, version=None):
+    """
+    Copy every vector, text and metadata out of a Chroma store
+    (no re-embedding)
+    """
+    data = vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+    write_index(
+        directory,
+        data["ids"],
+        data["documents"],
+        data["metadatas"],
+        data["embeddings"] if data["embeddings"] is not None else [],
+        version=version,
+    )
+    print(f"✅ Exported {len(data['ids'])} vectors to {directory}")
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Read-optimized vector store backed by a memory-mapped NumPy matrix
+    Similarity is cosine (vectors are stored normalized)
+    """
+
+    def __init__(self, directory, embedding_function):
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self._load()
+
+    def _load(self, attempts=3):
+        for attempt in range(attempts):
+            path = current_path(self.directory)
+            if path is None:
+                raise FileNotFoundError(f"No vector index in {self.directory}")
+            try:
+                with open(os.path.join(path, DOCUMENTS_FILE), encoding="utf-8") as f:
+                    sidecar = json.load(f)
+                vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # Two newer exports landed between reading the pointer and
+                # opening the files, and this generation was cleaned up
+                if attempt == attempts - 1:
+                    raise
+
+        self.version = sidecar.get("version")
+        self.ids = sidecar["ids"]
+        self.documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(sidecar["texts"], sidecar["metadatas"])
+        ]
+        self.vectors = vectors
+
+        # Both files come from one generation; a mismatch means a corrupt export
+        if self.documents and len(self.vectors) != len(self.documents):
+            raise ValueError(
+                f"Vector index in {path} has {len(self.vectors)} vectors for {len(self.documents)} documents"
+            )
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def __len__(self):
+        return len(self.documents)
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        if not self.documents:
+            return []
+
+        query = _normalize(embedding)
+        scores = self.vectors @ query
+
+        k = min(k, len(scores))
+        # argpartition finds the top k in linear time, then only those are sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """
+        Embed and append texts, then rewrite the index files
+        Meant for small additions; bulk builds go through write_index
+        """
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+
+        new_vectors = self.embedding_function.embed_documents(texts)
+        vectors = np.vstack([np.asarray(self.vectors), _normalize(new_vectors)]) if len(self.documents) else new_vectors
+
+        write_index(
+            self.directory,
+            self.ids + ids,
+            [doc.page_content for doc in self.documents] + texts,
+            [doc.metadata for doc in self.documents] + metadatas,
+            vectors,
+            version=self.version,
+        )
+        self._load()
+
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, directory=None, ids=None, **kwargs):
+        texts = list(texts)
+        if directory is None:
+            raise ValueError("NumpyVectorStore.from_texts needs a directory")
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+
+        write_index(directory, ids, texts, metadatas, embedding.embed_documents(texts))
+
+        return cls(directory, embedding)
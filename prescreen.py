@@ -0,0 +1,153 @@
+"""
+Rule-Based Pre-Screen
+Scans marketing text for the deterministic greenwashing indicators the
+analyzer prompt lists (vague terms, absolute claims, future commitments,
+comparisons, labels, carbon claims) with one compiled regex, no network.
+- Text with no environmental claim at all is marked clean (the workflow
+  can be told to skip the LLM agents for it)
+- Everything else reaches the agents with the phrases already flagged and
+  the headings of the articles most likely to apply (resolved to article
+  numbers against the indexed directive, see ArticleIndex.numbers_for_titles)
+Patterns match word stems where claims vary in form ("responsibly",
+"co₂"), since a missed claim costs more than an extra analyzer call.
+"""
+
+import re
+
+# Directive article headings (the start of each, as parsed from the PDF)
+SUBSTANTIATION = "Substantiation of explicit environmental claims"  # Article 3
+COMPARATIVE_SUBSTANTIATION = "Substantiation of comparative"  # Article 4
+COMMUNICATION = "Communication of explicit environmental claims"  # Article 5 (incl. future performance)
+COMPARATIVE_COMMUNICATION = "Communication of comparative"  # Article 6
+LABELS = "Environmental labels"  # Article 7
+LABELLING_SCHEMES = "Requirements for environmental labelling schemes"  # Article 8
+VERIFICATION = "Verification and certification"  # Article 10
+
+# Indicator category -> (lexicon, headings of the articles it falls under)
+# When two phrases start at the same position the earlier category wins,
+# so multi-word patterns ("greener than") come before single words ("green")
+INDICATORS = {
+    "comparison": (
+        [
+            r"(?:greener|cleaner|better|more sustainable) than", r"less (?:plastic|waste|co[2₂]|carbon|emissions?|water)",
+            r"compared to", r"(?:lower|fewer|reduced) (?:emissions?|footprint|impact)",
+        ],
+        [COMPARATIVE_SUBSTANTIATION, COMPARATIVE_COMMUNICATION],
+    ),
+    "carbon": (
+        [
+            r"carbon[- ](?:neutral|negative|positive|free|compensated|offset)", r"climate[- ](?:neutral|positive)",
+            r"net[- ]zero", r"co[2₂][- ]?(?:neutral|free|negative)", r"offset(?:s|ting)?",
+        ],
+        [SUBSTANTIATION, COMMUNICATION],
+    ),
+    "future": (
+        [
+            r"by (?:19|20)\d\d", r"(?:will|shall) (?:be|become|reach|achieve|cut|reduce)",
+            r"commit(?:ted|s|ment)? to", r"on track to", r"pledge[sd]?", r"aim(?:s|ing)? to",
+        ],
+        [COMMUNICATION, SUBSTANTIATION],
+    ),
+    "absolute": (
+        [
+            r"100\s?%", r"completely", r"totally", r"fully", r"entirely", r"zero[- ](?:waste|emissions?|impact)",
+            r"no (?:harmful |toxic )?(?:impact|emissions?|waste|chemicals?|toxins?)", r"impact[- ]free", r"guilt[- ]free",
+        ],
+        [SUBSTANTIATION, COMMUNICATION],
+    ),
+    "vague": (
+        [
+            r"eco[- ]?friendly", r"environmentally (?:friendly|responsible|conscious|sound)",
+            r"nature[- ]friendly", r"planet[- ]friendly", r"climate[- ]friendly", r"earth[- ]friendly",
+            r"low[- ]impact", r"(?:reef|ocean|planet)[- ]safe", r"(?:responsibly|ethically|sustainably) sourced",
+            r"green(?:er|est)?", r"eco(?:logical)?", r"sustainab\w*", r"natural\w*", r"responsib\w*", r"conscious\w*",
+            r"clean", r"biodegradab\w*", r"non[- ]toxic",
+        ],
+        [COMMUNICATION, SUBSTANTIATION],
+    ),
+    "label": (
+        [
+            r"certified", r"certification", r"label(?:led|ed)?", r"approved", r"accredited", r"ecolabel", r"seal",
+            r"b[- ]?corp\w*",
+        ],
+        [LABELS, LABELLING_SCHEMES, VERIFICATION],
+    ),
+}
+
+# Words showing the text makes some environmental claim. Their presence alone
+# doesn't flag anything, but such text is never treated as clean (nor is text
+# with a comparison, carbon, vague or label indicator; "100%" or "by 2030"
+# alone is)
+ENVIRONMENTAL_CATEGORIES = frozenset(["topic", "comparison", "carbon", "vague", "label"])
+ENVIRONMENTAL_TOPIC = [
+    r"environment\w*", r"climate", r"carbon", r"co[2₂]", r"emission\w*", r"planet", r"earth", r"nature",
+    r"recycl\w*", r"renewab\w*", r"organic\w*", r"plastics?", r"packaging", r"footprints?",
+    r"energy", r"wastes?", r"water", r"forest\w*", r"trees?", r"reefs?", r"oceans?", r"solar",
+    r"compost\w*", r"reus(?:e|able|ed)", r"vegan", r"chemicals?", r"toxi\w*", r"impact", r"pollut\w*",
+    r"biodiversity", r"wildlife",
+]
+
+
+def _compile():
+    groups = [
+        f"(?P<{category}>{'|'.join(patterns)})"
+        for category, (patterns, _) in INDICATORS.items()
+    ]
+    groups.append(f"(?P<topic>{'|'.join(ENVIRONMENTAL_TOPIC)})")
+    # Indicators come first so they win over a topic word at the same position.
+    # Lookarounds instead of \b so phrases may end in a symbol ("100%").
+    # Matched against lowercased text: much faster than re.IGNORECASE
+    return re.compile(r"(?<!\w)(?:" + "|".join(groups) + r")(?!\w)")
+
+
+SCANNER = _compile()
+# Topic words inside a matched phrase of another category ("no harmful chemicals")
+TOPIC_SCANNER = re.compile(r"(?<!\w)(?:" + "|".join(ENVIRONMENTAL_TOPIC) + r")(?!\w)")
+
+
+def prescreen(text):
+    """
+    Scan a text for greenwashing indicators
+
+    Args:
+        text: Marketing text
+
+    Returns:
+        Dict with:
+        - flagged_phrases: Indicator phrases found (lowercased, no repeats)
+        - categories: Indicator categories found, in order of first appearance
+        - likely_titles: Headings of the articles those categories fall under
+        - score: Number of distinct flagged phrases
+        - clean: True if the text makes no environmental claim at all
+    """
+    phrases = {}
+    categories = {}
+    topic = False
+
+    for match in SCANNER.finditer(text.lower()):
+        category = match.lastgroup
+        if category != "topic":
+            phrases[match.group()] = None
+            categories[category] = None
+        topic = topic or category in ENVIRONMENTAL_CATEGORIES or TOPIC_SCANNER.search(match.group()) is not None
+
+    titles = {}
+    for category in categories:
+        titles.update(dict.fromkeys(INDICATORS[category][1]))
+
+    return {
+        "flagged_phrases": list(phrases),
+        "categories": list(categories),
+        "likely_titles": list(titles),
+        "score": len(phrases),
+        "clean": not topic,
+    }
+
+
+def prescreen_many(texts):
+    """
+    Pre-screen a batch of texts
+    Repeated texts are scanned once (and share the same result dict)
+    """
+    results = {}
+    return [results[text] if text in results else results.setdefault(text, prescreen(text)) for text in texts]
@@ -0,0 +1,250 @@
+"""
+Query Result Cache
+- QueryCache: two-tier (in-process LRU + optional on-disk SQLite) cache with
+  TTL for search results, keyed on the normalized query, k and the index version
+- SemanticQueryCache: reuses results for near-duplicate queries by comparing
+  query embeddings
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+QUERY_CACHE_SIZE = 256  # Entries kept in memory per process
+QUERY_CACHE_TTL_SECONDS = 3600  # Entries older than this are recomputed
+SEMANTIC_CACHE_SIZE = 128  # Recent query embeddings compared against
+SEMANTIC_CACHE_THRESHOLD = 0.95  # Minimum cosine similarity to reuse results
+
+
+def query_cache_key(query, k, index_version):
+    """
+    Cache key for a search: queries differing only in case/whitespace share it,
+    and a new index version never matches entries from the old one
+    """
+    normalized = normalize_text(query).lower()
+    digest = hashlib.sha256(f"{k}\x1f{normalized}".encode("utf-8")).hexdigest()
+    return f"{index_version}:{digest}"
+
+
+class QueryCache:
+    """
+    LRU + TTL cache for search results with an optional on-disk tier
+    Tracks hit rate and the compute time saved by hits
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_SECONDS, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._memory = OrderedDict()  # key -> (value, stored_at, cost_seconds)
+        self._lock = threading.Lock()
+
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, cost REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Cached value for a key, or None on a miss (or expired entry)
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._memory[key]
+                entry = None
+
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, stored_at, cost FROM query_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    entry = tuple(row)
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[2]
+            return entry[0]
+
+    def put(self, key, value, cost=0.0):
+        """
+        Store a value
+
+        Args:
+            key: Cache key (see query_cache_key)
+            value: Result to cache (must be a string for the on-disk tier)
+            cost: Seconds it took to compute, credited as saved on each hit
+        """
+        entry = (value, time.time(), cost)
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, value, stored_at, cost) VALUES (?, ?, ?, ?)",
+                    (key, *entry),
+                )
+                self._conn.commit()
+
+    async def aget(self, key):
+        """
+        get() for async callers: with an on-disk tier the lookup runs in a
+        worker thread, so SQLite reads don't stall the event loop
+        """
+        if self._conn is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key, value, cost=0.0):
+        """
+        put() for async callers (SQLite writes run in a worker thread)
+        """
+        if self._conn is None:
+            return self.put(key, value, cost)
+        return await asyncio.to_thread(self.put, key, value, cost)
+
+    def purge_other_versions(self, index_version):
+        """
+        Drop entries computed against any other index version
+        """
+        prefix = f"{index_version}:"
+        with self._lock:
+            for key in [key for key in self._memory if not key.startswith(prefix)]:
+                del self._memory[key]
+            if self._conn is not None:
+                self._conn.execute(
+                    "DELETE FROM query_cache WHERE substr(key, 1, ?) != ?",
+                    (len(prefix), prefix),
+                )
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM query_cache")
+                self._conn.commit()
+
+    def stats(self):
+        """
+        Hit/miss counters and compute time saved for this process
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "entries": len(self._memory),
+        }
+
+
+class SemanticQueryCache:
+    """
+    Reuses results for near-duplicate queries
+    Keeps the embeddings of the most recent queries in a ring buffer and
+    returns the stored results of the closest one when its cosine
+    similarity reaches the threshold. Only entries with the same scope
+    (e.g. mode, k and named articles) are compared.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None  # (max_entries, dim) matrix of normalized query embeddings
+        self._entries = [None] * max_entries  # (scope, results) per slot
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, vector, scope):
+        """
+        Results of the most similar recent query with the same scope
+
+        Args:
+            vector: Query embedding
+            scope: Hashable tuple; only entries with an equal scope can match
+
+        Returns:
+            Cached results, or None on a miss
+        """
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+
+            query = np.array(vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            scores = self._vectors @ query
+
+            best, best_score = None, self.threshold
+            for slot in np.flatnonzero(scores >= self.threshold):
+                entry = self._entries[slot]
+                if entry is not None and entry[0] == scope and scores[slot] >= best_score:
+                    best, best_score = entry[1], scores[slot]
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return list(best)
+
+    def add(self, vector, scope, results):
+        """
+        Remember the results of a query (overwrites the oldest entry when full)
+        """
+        query = np.array(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+            self._vectors[self._next] = query
+            self._entries[self._next] = (scope, list(results))
+            self._next = (self._next + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.max_entries
+            self._next = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": sum(1 for entry in self._entries if entry is not None),
+        }
@@ -6,92 +6,214 @@ Docstring for rag
 4. Store in vector DB
 Enable search
 '''
+import asyncio
 import os
+import weakref
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from indexing import get_index_version, index_chunks, sources_changed, sync_index
+from numpy_store import NumpyVectorStore, export_from_chroma
+from numpy_store import index_exists as numpy_index_exists
+from numpy_store import index_version as numpy_index_version
+from retrieval import ArticleIndex, BM25Index, article_numbers, reciprocal_rank_fusion
+from query_cache import SEMANTIC_CACHE_THRESHOLD, SemanticQueryCache
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
-# Loading environment variables
-load_dotenv()
-
-PDF_PATH = r"C:\Users\modhu\OneDrive\Desktop\Hackathon\EU_2023_Dir.pdf"  # Your EU directive PDF
+# LangChain community/OpenAI modules are imported inside the functions that
+# use them: they take over a second to import and most callers never need them
+PDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "EU_2023_Dir.pdf")  # Your EU directive PDF
+PDF_PATHS = [PDF_PATH]  # Every document in the corpus (add more regulatory PDFs here)
+ARTICLE_SOURCE = os.path.basename(PDF_PATH)  # Document that "Article N" in queries refers to
 CHROMA_DB_DIR = "./chroma_db"  # Where vector database will be stored
+NUMPY_INDEX_DIR = "./numpy_index"  # Memory-mapped export used by the "numpy" backend
+VECTOR_BACKEND = "chroma"  # "chroma" or "numpy" (in-process, memory-mapped, fast cold start)
 CHUNK_SIZE = 1000  # Size of text chunks (characters)
 CHUNK_OVERLAP = 200  # Overlap between chunks (for context continuity)
+EMBEDDING_MODEL = "text-embedding-3-small"  # choice of embedder
+SEARCH_MODE = "hybrid"  # "dense" (vectors), "sparse" (BM25, no embedding call) or "hybrid" (both, fused)
+
+# Shared by indexing and querying so each text is only embedded once
+_embeddings = None
+
+def get_embeddings():
+    """
+    Lazy load the cache-backed embedder
+    Indexing and searching both go through the same on-disk embedding cache
+    """
+    global _embeddings
+
+    if _embeddings is None:
+        from langchain_openai import OpenAIEmbeddings
+        
+        load_dotenv()  # OPENAI_API_KEY
+        _embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(model=EMBEDDING_MODEL),
+            model=EMBEDDING_MODEL,
+            cache=EmbeddingCache(),
+        )
+
+    return _embeddings
 
 import re
+from bisect import bisect_right
+from langchain_core.documents import Document
 
-def chunk_by_articles(documents):
+MAX_ARTICLE_CHARS = 6000  # Articles longer than this are sub-chunked
+CHUNKER_VERSION = 2  # Bump when chunk text or metadata changes, so existing indexes get re-chunked
+
+# Compiled once for the whole document.
+# A section boundary is either an article heading standing alone on its line
+# ("Article 7", unlike inline references such as "pursuant to Article 3(4)")
+# or the closing formula / annex that follows the last article
+SECTION_BOUNDARY = re.compile(
+    r'^[ \t]*(?:Article[ \t]+(?P<number>\d+)[ \t]*$'
+    r'|(?P<end>Done at \w+|LEGISLATIVE FINANCIAL STATEMENT|ANNEX\b))',
+    re.MULTILINE,
+)
+# Running page header/footer such as "EN 52  EN"
+PAGE_FURNITURE = re.compile(r'^[ \t]*EN[ \t]+\d+[ \t]+EN[ \t]*$\n?', re.MULTILINE)
+
+def _emit_section(pieces, article, splitter, source):
     """
-    Chunk documents by article sections
-    Attempts to keep each article as a complete chunk
+    Turn the buffered (page, text) pieces of one section into chunks
+    An article becomes a single chunk unless it is longer than the
+    splitter's chunk size, in which case it is split into parts.
+    Text outside articles (preamble, annexes) is split the same way.
+    """
+    page_starts = []
+    page_numbers = []
+    text = ""
+    for page, piece in pieces:
+        if not piece.strip():
+            continue
+        page_starts.append(len(text))
+        page_numbers.append(page)
+        text += piece
+    
+    if not text.strip():
+        return
+    
+    def page_at(offset):
+        return page_numbers[bisect_right(page_starts, offset) - 1]
+    
+    metadata = {'source': source}
+    if article is not None:
+        metadata['article'] = article
+        lines = [line.strip() for line in text.strip().splitlines()]
+        if len(lines) > 1 and lines[1]:
+            metadata['title'] = lines[1]
+    
+    if len(text) <= splitter._chunk_size:
+        yield Document(
+            page_content=text.strip(),
+            metadata={**metadata, 'page': page_numbers[0], 'page_end': page_numbers[-1]}
+        )
+        return
+    
+    parts = splitter.create_documents([text])
+    for i, part in enumerate(parts, 1):
+        start = part.metadata['start_index']
+        content = part.page_content
+        # Later parts repeat the heading so they stay attributable on their own
+        if article is not None and i > 1:
+            content = f"{article} (part {i}/{len(parts)})\n{content}"
+        yield Document(
+            page_content=content,
+            metadata={
+                **metadata,
+                'page': page_at(start),
+                'page_end': page_at(start + len(part.page_content) - 1),
+                'part': i,
+                'parts': len(parts),
+            }
+        )
+
+def iter_article_chunks(documents, max_chars=MAX_ARTICLE_CHARS, source=None):
     """
-    chunks = []
+    Single-pass, cross-page article segmenter
+    Yields one chunk per article, with the article's page range, even when
+    the article continues over several pages. Articles longer than
+    max_chars are split into parts. Pages are consumed one at a time, and
+    only the article currently being read is buffered.
+    
+    Chunks are labelled with `source` (default: the file name in the
+    pages' own "source" metadata).
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=max_chars,
+        chunk_overlap=CHUNK_OVERLAP,
+        add_start_index=True,
+    )
+    
+    article = None  # Article being collected (None outside articles)
+    pieces = []  # (page, text) pieces of the current section
+    doc_source = source
     
     for doc in documents:
-        text = doc.page_content
         page = doc.metadata.get('page', 'Unknown')
+        if source is None:
+            doc_source = os.path.basename(str(doc.metadata.get('source', ''))) or 'Unknown'
+        text = PAGE_FURNITURE.sub('', doc.page_content)
+        position = 0
         
-        # Split on article markers
-        # Matches: "Article 1", "Article 2", etc.
-        article_pattern = r'(Article\s+\d+)'
-        
-        # Split but keep the delimiter (article marker)
-        parts = re.split(f'({article_pattern})', text)
+        for match in SECTION_BOUNDARY.finditer(text):
+            # Whatever precedes the boundary belongs to the previous section,
+            # even if that section started on an earlier page
+            pieces.append((page, text[position:match.start()]))
+            yield from _emit_section(pieces, article, splitter, doc_source)
+            pieces = []
+            
+            number = match.group('number')
+            article = f"Article {number}" if number else None
+            position = match.start()
         
-        current_article = None
-        current_text = ""
+        pieces.append((page, text[position:] + "\n"))
         
-        for part in parts:
-            # Check if this part is an article marker
-            if re.match(article_pattern, part):
-                # Save previous article if exists
-                if current_article and current_text.strip():
-                    chunks.append({
-                        'content': current_text.strip(),
-                        'metadata': {
-                            'page': page,
-                            'article': current_article,
-                            'source': 'EU_Green_Claims_Directive'
-                        }
-                    })
-                
-                # Start new article
-                current_article = part
-                current_text = part + " "
-            else:
-                current_text += part
-        
-        # Don't forget the last article
-        if current_article and current_text.strip():
-            chunks.append({
-                'content': current_text.strip(),
-                'metadata': {
-                    'page': page,
-                    'article': current_article,
-                    'source': 'EU_Green_Claims_Directive'
-                }
-            })
-    
-    # Convert to Document objects
-    from langchain.schema import Document
-    doc_chunks = [
-        Document(page_content=chunk['content'], metadata=chunk['metadata'])
-        for chunk in chunks
-    ]
+        # Outside articles there is nothing to merge, so emit page by page
+        if article is None:
+            yield from _emit_section(pieces, article, splitter, doc_source)
+            pieces = []
+    
+    # Don't forget the last article
+    yield from _emit_section(pieces, article, splitter, doc_source)
+
+def chunk_by_articles(documents):
+    """
+    Chunk documents by article sections
+    Keeps each article as a complete chunk across page boundaries
+    """
+    doc_chunks = list(iter_article_chunks(documents))
     
     print(f"✅ Created {len(doc_chunks)} article-based chunks")
     
     # Show sample of what we got
-    articles = [chunk['metadata'].get('article') for chunk in chunks if chunk['metadata'].get('article')]
-    unique_articles = set(articles)
-    print(f"📋 Found {len(unique_articles)} unique articles: {sorted(unique_articles)[:10]}...")
+    articles = [chunk.metadata.get('article') for chunk in doc_chunks if chunk.metadata.get('article')]
+    unique_articles = sorted(set(articles), key=lambda article: int(article.split()[-1]))
+    print(f"📋 Found {len(unique_articles)} unique articles: {unique_articles[:10]}...")
     
     return doc_chunks
 
+def iter_pdf_pages(pdf_path):
+    """
+    Stream PDF pages one at a time instead of loading the whole document
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+    
+    return PyPDFLoader(pdf_path).lazy_load()
+
+def iter_pdf_chunks(pdf_path):
+    """
+    Streaming counterpart of load_and_chunk_pdf
+    Pages are parsed, segmented and handed on one at a time, so memory stays
+    flat and the first chunks are ready before the last page is parsed
+    
+    Args: pdf_path: Path to the PDF file
+    Yields: document chunks
+    """
+    yield from iter_article_chunks(iter_pdf_pages(pdf_path), source=os.path.basename(pdf_path))
+
 
 
 
@@ -101,6 +223,9 @@ def load_and_chunk_pdf(pdf_path):
     Args: pdf_path: Path to the PDF file 
     Returns: ist of document chunks
     """
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
     # Load PDF
     loader = PyPDFLoader(pdf_path)
     documents = loader.load()
@@ -110,8 +235,8 @@ def load_and_chunk_pdf(pdf_path):
     try:
         chunks = chunk_by_articles(documents)
         
-        # If we got reasonable number of chunks, use them
-        if len(chunks) > 10:  # Sanity check
+        # If we found a reasonable number of articles, use them
+        if sum(1 for chunk in chunks if chunk.metadata.get('article')) > 10:  # Sanity check
             print(f"✅ Using article-based chunking")
             return chunks
     except Exception as e:
@@ -127,6 +252,8 @@ def load_and_chunk_pdf(pdf_path):
     )
     
     chunks = text_splitter.split_documents(documents)
+    for chunk in chunks:
+        chunk.metadata['source'] = os.path.basename(pdf_path)
     
     print(f"Created {len(chunks)} chunks")
     
@@ -140,33 +267,53 @@ def create_vector_store(chunks):
     Returns:
         Chroma vector store
     """
-    print("⏳ This will take 1-2 minutes and cost ~$0.10-0.20")
+    from langchain_community.vectorstores import Chroma
     
-    # Create embeddings using OpenAI
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small"  # chpice of embedder
-    )
-    #sends each chunk to OpenAI API to convert to embeddings (vectors)
-    # Create vector database
-    vectorstore = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings, #using the embedding choice
-        persist_directory=CHROMA_DB_DIR
+    print(f"⏳ Embedding {len(chunks)} chunks...")
+    
+    # Create embeddings using OpenAI (cached chunks are not sent again)
+    embeddings = get_embeddings()
+    
+    # Create vector database, then embed chunks in concurrent batches
+    # and bulk-insert the vectors
+    vectorstore = Chroma(
+        persist_directory=CHROMA_DB_DIR,
+        embedding_function=embeddings
     )
+    index_chunks(chunks, vectorstore, embeddings)
     
     print(f"Vector database created and saved to {CHROMA_DB_DIR}")
+    print(f"📊 Embedding cache: {embeddings.stats()}")
     
     return vectorstore
 
 #loading the vector database that we just created so that we dont have to pay everytime we need
 #it and then create it 
-def load_vector_store():
+def load_vector_store(backend=None):
+    """
+    Args:
+        backend: "chroma" or "numpy" (defaults to VECTOR_BACKEND)
+        
+    Returns:
+        Vector store
+    """
+    if backend is None:
+        backend = VECTOR_BACKEND
     
-    print(f"Loading existing vector database from {CHROMA_DB_DIR}")
+    embeddings = get_embeddings()
     
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small"
-    )
+    if backend == "numpy":
+        print(f"Loading memory-mapped vector index from {NUMPY_INDEX_DIR}")
+        vectorstore = NumpyVectorStore(NUMPY_INDEX_DIR, embeddings)
+        print(f"✅ Vector index loaded ({len(vectorstore)} chunks)")
+        return vectorstore
+    
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector backend: {backend}")
+    
+    from langchain_community.vectorstores import Chroma
+    
+    print(f"Loading existing vector database from {CHROMA_DB_DIR}")
     
     vectorstore = Chroma(
         persist_directory=CHROMA_DB_DIR,
@@ -176,14 +323,124 @@ def load_vector_store():
     print("✅ Vector database loaded")
     
     return vectorstore
-def search_directive(query, vectorstore=None, k=3):
+# Local indexes per loaded vector store, built once from its chunks
+_article_indexes = weakref.WeakKeyDictionary()
+_bm25_indexes = weakref.WeakKeyDictionary()
+_semantic_caches = weakref.WeakKeyDictionary()
+
+def get_article_index(vectorstore, rebuild=False):
+    """
+    Lazy load the article-number index for a vector store
+    
+    Args:
+        vectorstore: Vector store whose chunks are indexed
+        rebuild: Rebuild even if an index exists (after re-indexing)
+    
+    Returns:
+        ArticleIndex
+    """
+    if rebuild or vectorstore not in _article_indexes:
+        _article_indexes[vectorstore] = ArticleIndex.from_vectorstore(vectorstore, source=ARTICLE_SOURCE)
+    
+    return _article_indexes[vectorstore]
+
+def get_bm25_index(vectorstore, rebuild=False):
+    """
+    Lazy load the BM25 sparse index over the same chunks as the vector store
+    
+    Args:
+        vectorstore: Vector store whose chunks are indexed
+        rebuild: Rebuild even if an index exists (after re-indexing)
+    
+    Returns:
+        BM25Index
+    """
+    if rebuild or vectorstore not in _bm25_indexes:
+        _bm25_indexes[vectorstore] = BM25Index.from_vectorstore(vectorstore)
+    
+    return _bm25_indexes[vectorstore]
+
+def get_semantic_cache(vectorstore, rebuild=False):
+    """
+    Lazy load the semantic query cache of a vector store
+    
+    Args:
+        vectorstore: Vector store whose search results are cached
+        rebuild: Start from an empty cache (after re-indexing)
+    
+    Returns:
+        SemanticQueryCache
+    """
+    if rebuild or vectorstore not in _semantic_caches:
+        _semantic_caches[vectorstore] = SemanticQueryCache(threshold=SEMANTIC_CACHE_THRESHOLD)
+    
+    return _semantic_caches[vectorstore]
+
+def _search_by_vector(query, query_vector, vectorstore, k, mode, use_semantic_cache):
+    """
+    Dense/hybrid search for an already embedded query (all local work)
+    """
+    # Near-duplicate of a recent query: reuse its chunks
+    scope = (mode, k, tuple(article_numbers(query)))
+    semantic_cache = get_semantic_cache(vectorstore) if use_semantic_cache else None
+    found = semantic_cache.lookup(query_vector, scope) if semantic_cache else None
+    
+    if found is None:
+        if mode == "dense":
+            found = vectorstore.similarity_search_by_vector(query_vector, k=k)
+        else:
+            # Over-fetch from both retrievers so fusion has candidates to rerank
+            found = reciprocal_rank_fusion(
+                [
+                    vectorstore.similarity_search_by_vector(query_vector, k=2 * k),
+                    get_bm25_index(vectorstore).search(query, k=2 * k),
+                ],
+                k=k,
+            )
+        if semantic_cache:
+            semantic_cache.add(query_vector, scope, found)
+    
+    return found
+
+def _merge_results(results, found, k):
+    """
+    Append search results after the article lookup results, skipping duplicates
+    """
+    seen = {doc.page_content for doc in results}
+    for doc in found:
+        if len(results) >= k:
+            break
+        if doc.page_content not in seen:
+            seen.add(doc.page_content)
+            results.append(doc)
+    
+    return results
+
+def search_directive(
+    query,
+    vectorstore=None,
+    k=3,
+    article_lookup=True,
+    merge_semantic=False,
+    mode=None,
+    use_semantic_cache=True,
+):
     """
     Searches the EU directive for relevant content
     
+    Queries that name an article ("Article 7 ...") are answered straight from
+    the article index, without an embedding call or vector search, unless
+    none of their other words appear in that article.
+    
     Args:
         query: Search query string
         vectorstore: Vector store (will load if not provided)
         k: Number of results to return
+        article_lookup: Resolve queries naming an article number by direct lookup
+        merge_semantic: Fill the remaining slots after a lookup with search results
+        mode: "dense", "sparse" or "hybrid" (defaults to SEARCH_MODE)
+        use_semantic_cache: Reuse results of a recent near-identical query
+            (dense and hybrid modes, which embed the query anyway)
         
     Returns:
         List of relevant document chunks
@@ -192,37 +449,176 @@ def search_directive(query, vectorstore=None, k=3):
     if vectorstore is None:
         vectorstore = load_vector_store()
     
+    if mode is None:
+        mode = SEARCH_MODE
+    
+    results = []
+    if article_lookup:
+        article_index = get_article_index(vectorstore)
+        results = article_index.find(query)[:k]
+        # A query whose words the named article doesn't contain likely has the
+        # wrong number, so it also gets search results
+        if results and not merge_semantic and article_index.covers(query):
+            return results
+    
     # Search
-    results = vectorstore.similarity_search(query, k=k)
+    if mode == "sparse":
+        # BM25 needs no embedding, and is cheaper than any cache lookup
+        found = get_bm25_index(vectorstore).search(query, k=k)
+    elif mode in ("dense", "hybrid"):
+        query_vector = vectorstore.embeddings.embed_query(query)
+        found = _search_by_vector(query, query_vector, vectorstore, k, mode, use_semantic_cache)
+    else:
+        raise ValueError(f"Unknown search mode: {mode}")
+    
+    return _merge_results(results, found, k)
+
+async def asearch_directive(
+    query,
+    vectorstore=None,
+    k=3,
+    article_lookup=True,
+    merge_semantic=False,
+    mode=None,
+    use_semantic_cache=True,
+):
+    """
+    Async version of search_directive (same arguments and results)
+    The query embedding is awaited and the vector search runs in a worker
+    thread, so many searches can be in flight on one event loop
+    """
+    # Load vector store if not provided
+    if vectorstore is None:
+        vectorstore = await asyncio.to_thread(load_vector_store)
+    
+    if mode is None:
+        mode = SEARCH_MODE
+    
+    results = []
+    if article_lookup:
+        article_index = get_article_index(vectorstore)
+        results = article_index.find(query)[:k]
+        # A query whose words the named article doesn't contain likely has the
+        # wrong number, so it also gets search results
+        if results and not merge_semantic and article_index.covers(query):
+            return results
+    
+    # Search
+    if mode == "sparse":
+        found = get_bm25_index(vectorstore).search(query, k=k)
+    elif mode in ("dense", "hybrid"):
+        query_vector = await vectorstore.embeddings.aembed_query(query)
+        found = await asyncio.to_thread(
+            _search_by_vector, query, query_vector, vectorstore, k, mode, use_semantic_cache
+        )
+    else:
+        raise ValueError(f"Unknown search mode: {mode}")
+    
+    return _merge_results(results, found, k)
+
+def fetch_articles(numbers, vectorstore=None, query=None, extra_k=2):
+    """
+    Fetch several articles at once for routed validation
+    
+    Every article is a direct lookup in the article index; with a query, a
+    few BM25 matches are added to cover anything the routing missed. No
+    embedding call is made.
+    
+    Args:
+        numbers: Article numbers to fetch, in order
+        vectorstore: Vector store (will load if not provided)
+        query: Optional text to find extra related chunks for
+        extra_k: Number of extra chunks for the query
+        
+    Returns:
+        List of document chunks (requested articles first, no duplicates)
+    """
+    if vectorstore is None:
+        vectorstore = load_vector_store()
+    
+    article_index = get_article_index(vectorstore)
+    results = []
+    for number in numbers:
+        results.extend(article_index.lookup(number))
+    
+    if query:
+        found = get_bm25_index(vectorstore).search(query, k=extra_k + len(results))
+        results = _merge_results(results, found, len(results) + extra_k)
     
     return results
-def setup_rag():
+
+def vector_store_exists(backend=None):
+    """
+    Whether a vector database for the backend (defaults to VECTOR_BACKEND)
+    is already on disk
     """
-    Main setup function - creates vector database if it doesn't exist
+    if backend is None:
+        backend = VECTOR_BACKEND
+    if backend == "numpy":
+        return numpy_index_exists(NUMPY_INDEX_DIR)
+    return os.path.exists(CHROMA_DB_DIR)
+
+def setup_rag(pdf_paths=None):
+    """
+    Main setup function - creates the vector database if it doesn't exist
+    and incrementally re-indexes it when source PDFs change
+    
+    Chroma always holds the master index. With the "numpy" backend a
+    memory-mapped export of it is served instead, and Chroma is not even
+    opened when nothing changed since the last export.
+    
+    Args:
+        pdf_paths: List of PDFs to index (defaults to PDF_PATHS)
     
     Returns:
-        Chroma vector store
+        Vector store
     """
-    # Check if vector database already exists
-    if os.path.exists(CHROMA_DB_DIR):
-        print("✅ Vector database already exists, loading it...")
-        return load_vector_store()
+    if pdf_paths is None:
+        pdf_paths = PDF_PATHS
     
-    # Create new vector database
-    print("🆕 Vector database not found, creating new one...")
+    missing = [path for path in pdf_paths if not os.path.exists(path)]
     
-    # Check if PDF exists
-    if not os.path.exists(PDF_PATH):
+    if missing:
+        # Without the source files we can still serve an existing database
+        if vector_store_exists():
+            print(f"⚠️ Source PDF(s) not found, using existing vector database as-is: {missing}")
+            return load_vector_store()
+        
         raise FileNotFoundError(
-            f"PDF not found: {PDF_PATH}\n"
+            f"PDF not found: {missing[0]}\n"
             f"Please make sure EU_2023_Dir.pdf is in the same folder as this script"
         )
     
-    # Load and chunk PDF
-    chunks = load_and_chunk_pdf(PDF_PATH)
+    export_is_current = (
+        VECTOR_BACKEND == "numpy"
+        and not sources_changed(pdf_paths, CHROMA_DB_DIR, CHUNKER_VERSION)
+        and numpy_index_version(NUMPY_INDEX_DIR) == get_index_version(CHROMA_DB_DIR)
+    )
     
-    # Create vector database
-    vectorstore = create_vector_store(chunks)
+    if export_is_current:
+        vectorstore = load_vector_store()
+    else:
+        if os.path.exists(CHROMA_DB_DIR):
+            print("✅ Vector database already exists, checking for changes...")
+        else:
+            print("🆕 Vector database not found, creating new one...")
+        
+        vectorstore = load_vector_store(backend="chroma")
+        
+        # Only new or changed chunks are embedded, removed ones are deleted.
+        # Changed PDFs are streamed page by page through chunking and embedding
+        sync_index(pdf_paths, vectorstore, get_embeddings(), iter_pdf_chunks, CHROMA_DB_DIR, CHUNKER_VERSION)
+        
+        if VECTOR_BACKEND == "numpy":
+            version = get_index_version(CHROMA_DB_DIR)
+            if numpy_index_version(NUMPY_INDEX_DIR) != version:
+                export_from_chroma(vectorstore, NUMPY_INDEX_DIR, version=version)
+            vectorstore = load_vector_store()
+    
+    # Build the local indexes now so the first query doesn't pay for them
+    get_article_index(vectorstore, rebuild=True)
+    get_bm25_index(vectorstore, rebuild=True)
+    get_semantic_cache(vectorstore, rebuild=True)
     
     return vectorstore
 # Test code - runs when you execute this file directly
@@ -0,0 +1,241 @@
+"""
+Local Retrieval Indexes
+In-memory indexes built from the chunks already stored in the vector
+database, used to answer queries without an embedding call
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+
+# "Article 7", "article 7", "Art. 7", "Art 7"
+ARTICLE_REFERENCE = re.compile(r'\bart(?:icle|\.)?\s*(\d+)\b', re.IGNORECASE)
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "their this to was were which will with shall should may such".split()
+)
+RRF_K = 60  # Reciprocal rank fusion constant (dampens the weight of top ranks)
+GENERIC_TERMS = frozenset(["article", "art", "environmental", "claim", "directive"])  # Say nothing about which article
+
+
+def stored_documents(vectorstore):
+    """
+    Read every stored chunk back out of a vector store
+
+    Args:
+        vectorstore: Chroma store (or any store exposing a `documents` list)
+
+    Returns:
+        List of Documents
+    """
+    if hasattr(vectorstore, "_collection"):
+        data = vectorstore._collection.get(include=["documents", "metadatas"])
+        return [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+        ]
+    return list(vectorstore.documents)
+
+
+def article_numbers(query):
+    """
+    Article numbers mentioned in a query, in order of appearance (no repeats)
+    """
+    return list(dict.fromkeys(int(number) for number in ARTICLE_REFERENCE.findall(query)))
+
+
+class ArticleIndex:
+    """
+    Maps article number -> chunks of that article (in part order)
+    Lookups are plain dict accesses, so no embedding or vector search is needed
+
+    Article numbers are only unique within one document, so with several
+    regulations in the store pass `source` to index just the one that
+    "Article N" refers to
+    """
+
+    def __init__(self, documents, source=None):
+        self._by_number = {}
+        self._titles = {}  # number -> article heading, as parsed from the PDF
+        self._terms = {}  # number -> tokens of the article text (built on first use)
+
+        for doc in documents:
+            if source is not None and doc.metadata.get("source") != source:
+                continue
+            article = doc.metadata.get("article")
+            match = ARTICLE_REFERENCE.search(article) if article else None
+            if match:
+                number = int(match.group(1))
+                self._by_number.setdefault(number, []).append(doc)
+                if doc.metadata.get("title"):
+                    self._titles.setdefault(number, doc.metadata["title"])
+
+        for chunks in self._by_number.values():
+            chunks.sort(key=lambda doc: doc.metadata.get("part", 1))
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, source=None):
+        return cls(stored_documents(vectorstore), source=source)
+
+    def __len__(self):
+        return len(self._by_number)
+
+    def __contains__(self, number):
+        return number in self._by_number
+
+    def lookup(self, number):
+        """
+        Chunks of one article (empty list if the article is not indexed)
+        """
+        return list(self._by_number.get(number, []))
+
+    def find(self, query):
+        """
+        Chunks of every article the query names, in the order they are named
+
+        Args:
+            query: Search query such as "Article 5 future environmental performance"
+
+        Returns:
+            List of Documents (empty if the query names no indexed article)
+        """
+        results = []
+        for number in article_numbers(query):
+            results.extend(self._by_number.get(number, []))
+        return results
+
+    def numbers_for_titles(self, titles):
+        """
+        Article numbers whose indexed heading starts with one of `titles`
+        (case-insensitive), in the order the titles are given, no repeats
+        """
+        numbers = {}
+        for title in titles:
+            prefix = title.lower()
+            numbers.update(
+                (number, None) for number, heading in sorted(self._titles.items())
+                if heading.lower().startswith(prefix)
+            )
+        return list(numbers)
+
+    def covers(self, query):
+        """
+        Whether the articles a query names contain at least one of its other
+        words ("Article 5 future performance" -> "future" or "performance"),
+        so a lookup by a wrong article number isn't returned on its own.
+        True for a query that is only an article reference.
+        """
+        terms = set(tokenize(ARTICLE_REFERENCE.sub(" ", query))) - GENERIC_TERMS
+        if not terms:
+            return True
+        for number in article_numbers(query):
+            if number not in self._terms:
+                self._terms[number] = frozenset(
+                    tokenize(" ".join(doc.page_content for doc in self._by_number.get(number, [])))
+                )
+            if terms & self._terms[number]:
+                return True
+        return False
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens without stopwords, with plural "s" stripped
+    so "claims" and "claim" match
+    """
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Sparse inverted index with Okapi BM25 scoring
+    Needs no embedding call, so it works fully offline
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self._postings = {}  # term -> list of (document position, term frequency)
+
+        lengths = []
+        for position, doc in enumerate(self.documents):
+            counts = Counter(tokenize(doc.page_content))
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self._postings.setdefault(term, []).append((position, frequency))
+
+        count = len(self.documents)
+        average_length = (sum(lengths) / count) if count else 1.0
+
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+        # Length normalization only depends on the document, so precompute it
+        self._k1 = k1
+        self._norms = [k1 * (1 - b + b * length / (average_length or 1.0)) for length in lengths]
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        return cls(stored_documents(vectorstore))
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search_with_scores(self, query, k=3):
+        """
+        Top-k documents for a query
+
+        Returns:
+            List of (Document, score), best first
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self._postings[term]:
+                weight = idf * frequency * (self._k1 + 1) / (frequency + self._norms[position])
+                scores[position] = scores.get(position, 0.0) + weight
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.documents[position], score) for position, score in best]
+
+    def search(self, query, k=3):
+        return [doc for doc, _ in self.search_with_scores(query, k)]
+
+
+def reciprocal_rank_fusion(result_lists, k=3, rrf_k=RRF_K):
+    """
+    Merge several ranked result lists into one
+
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears
+    in, so documents ranked well by several retrievers rise to the top.
+
+    Args:
+        result_lists: Lists of Documents, each best first
+        k: Number of fused results to return
+
+    Returns:
+        List of Documents, best first
+    """
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, 1):
+            key = doc.page_content
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+
+    best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    return [documents[key] for key, _ in best]
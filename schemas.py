@@ -0,0 +1,169 @@
+"""
+Agent Output Schemas
+Pydantic models for the JSON each agent is asked to return, plus helpers
+to parse a reply against them and to ask the LLM to repair a reply that
+doesn't match
+"""
+
+import json
+import re
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+STRUCTURED_RETRIES = 1  # Repair attempts for a reply that doesn't match its schema
+
+
+class Analysis(BaseModel):
+    """
+    Agent 1 output
+    """
+    is_greenwashing: bool
+    confidence: int = Field(ge=0, le=100)
+    reasoning: str = ""
+    flagged_phrases: list[str] = []
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _strip_percent(cls, value):
+        # Models sometimes answer "85%" or 85.0
+        if isinstance(value, str):
+            value = value.strip().rstrip("%")
+        if isinstance(value, (str, float)):
+            value = round(float(value))
+        return value
+
+
+class Validation(BaseModel):
+    """
+    Agent 2 output
+    """
+    violated_articles: list[str] = []
+    explanations: dict[str, str] = {}
+
+
+class Rewrite(BaseModel):
+    """
+    Agent 3 output (also the reconciliation step)
+    """
+    suggested_text: str
+    changes_made: list[str] = []
+
+
+def parse_json_reply(text):
+    """
+    Extract the JSON object from an agent reply (which may be wrapped in
+    prose or a ```json fence)
+
+    Returns:
+        Parsed dict, or None if there is no valid JSON object
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def partial_json_string(text, field):
+    """
+    Value of a string field in a JSON reply that is still being streamed,
+    e.g. '{"suggested_text": "Packaging made wi' -> 'Packaging made wi'
+
+    Returns:
+        The value so far, or None if the field hasn't started yet
+    """
+    match = re.search(rf'"{re.escape(field)}"\s*:\s*"', text)
+    if match is None:
+        return None
+
+    raw = []
+    escaped = False
+    for char in text[match.end():]:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            break
+        raw.append(char)
+    raw = "".join(raw[:-1] if escaped else raw)
+
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        # Cut in the middle of a unicode escape ("caf\u00")
+        try:
+            return json.loads(f'"{raw[:raw.rfind(chr(92))]}"')
+        except json.JSONDecodeError:
+            return raw
+
+
+def parse_reply(text, schema):
+    """
+    Parse and validate a reply against a schema
+
+    Returns:
+        Tuple of (model instance or None, error message or None)
+    """
+    parsed = parse_json_reply(text)
+    if parsed is None:
+        return None, "the reply contains no JSON object"
+    try:
+        return schema.model_validate(parsed), None
+    except ValidationError as e:
+        return None, str(e)
+
+
+def repair_messages(text, schema, error):
+    """
+    Messages asking the LLM to turn a malformed reply into valid JSON
+    """
+    return [
+        SystemMessage(
+            content="You convert replies into JSON. Answer with a single JSON object "
+                    f"matching this JSON schema and nothing else:\n{json.dumps(schema.model_json_schema())}"
+        ),
+        HumanMessage(content=f"Reply to convert:\n{text}\n\nProblem with it: {error}"),
+    ]
+
+
+def parse_with_repair(text, schema, llm, retries=STRUCTURED_RETRIES):
+    """
+    Parse a reply, asking the LLM to repair it if it doesn't match the schema
+
+    Args:
+        text: Agent reply
+        schema: Pydantic model class
+        llm: Chat model used for repairs
+        retries: Repair attempts
+
+    Returns:
+        Model instance, or None if the reply couldn't be repaired
+    """
+    result, error = parse_reply(text, schema)
+    for _ in range(retries):
+        if result is not None:
+            break
+        print(f"⚠️ Reply doesn't match {schema.__name__} ({error.splitlines()[0]}), asking for a repair...")
+        text = llm.invoke(repair_messages(text, schema, error)).content
+        result, error = parse_reply(text, schema)
+    return result
+
+
+async def aparse_with_repair(text, schema, llm, retries=STRUCTURED_RETRIES):
+    """
+    Async version of parse_with_repair
+    """
+    result, error = parse_reply(text, schema)
+    for _ in range(retries):
+        if result is not None:
+            break
+        print(f"⚠️ Reply doesn't match {schema.__name__} ({error.splitlines()[0]}), asking for a repair...")
+        text = (await llm.ainvoke(repair_messages(text, schema, error))).content
+        result, error = parse_reply(text, schema)
+    return result
@@ -4,11 +4,11 @@ vectorstore = load_vector_store()
 
 # Test different searches
 test_queries = [
-    "Article 7 future environmental performance commitments",
+    "Article 5 future environmental performance commitments",
     "Article 6 comparative claims between products",
-    "Article 10 environmental labelling certification schemes",
+    "Article 8 environmental labelling certification schemes",
     "Article 5 generic environmental statements vague claims",
-    "Article 12 verification conformity assessment"
+    "Article 10 verification conformity assessment"
 ]
 
 for query in test_queries:
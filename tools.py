@@ -4,39 +4,128 @@ Tools for AI Agents
 This module defines tools that agents can use to interact with the RAG system
 """
 
-from langchain.tools import tool
-from rag import search_directive, load_vector_store, setup_rag
-import os
+import asyncio
+import json
+import threading
+import time
+from langchain_core.documents import Document
+from langchain_core.tools import tool
+from context import current_assembler
+from rag import CHROMA_DB_DIR, asearch_directive, get_bm25_index, load_vector_store, search_directive, setup_rag
+from rag import vector_store_exists
+from indexing import get_index_version
+from query_cache import QueryCache, query_cache_key
 
-# Global variable for lazy loading
+SEARCH_K = 5  # Chunks returned per tool call
+QUERY_CACHE_PATH = None  # e.g. "./query_cache.sqlite" to share results across processes/restarts
+WARMUP_QUERY = "substantiation of explicit environmental claims"  # Dummy search run by warmup()
+
+# Global variables for lazy loading
 _vectorstore = None
+_index_version = None
+_vectorstore_lock = threading.Lock()  # Parallel agents may all ask for the store on their first search
+_query_cache = QueryCache(path=QUERY_CACHE_PATH)
 
 def get_vectorstore():
     """
     Lazy load the vector store
-    Only creates/loads when first needed
+    Only creates/loads when first needed. Thread-safe: concurrent first
+    calls wait for a single setup_rag() instead of each running one.
     """
-    global _vectorstore
+    global _vectorstore, _index_version
     
     if _vectorstore is None:
-        print("📂 Initializing vector database...")
-        
-        # Check if database exists
-        if os.path.exists("./chroma_db"):
-            try:
-                print("✅ Loading existing vector database...")
-                _vectorstore = load_vector_store()
+        with _vectorstore_lock:
+            # Another thread may have finished loading while we waited
+            if _vectorstore is None:
+                print("📂 Initializing vector database...")
+                
+                # setup_rag loads the existing database and only re-embeds
+                # chunks whose source PDF changed (or builds it if missing)
+                try:
+                    vectorstore = setup_rag()
+                except Exception as e:
+                    vectorstore = _load_existing(e)
                 print("✅ Vector database loaded successfully")
-            except Exception as e:
-                print(f"⚠️ Error loading existing DB: {e}")
-                print("🆕 Creating new vector database...")
-                _vectorstore = setup_rag()
-        else:
-            print("🆕 Vector database not found, creating new one...")
-            _vectorstore = setup_rag()
+                
+                # Cached results from an older index must not be served
+                _index_version = get_index_version(CHROMA_DB_DIR)
+                _query_cache.purge_other_versions(_index_version)
+                
+                # Published last, so a thread seeing the store also sees its version
+                _vectorstore = vectorstore
     
     return _vectorstore
 
+def _load_existing(error):
+    """
+    Fallback when setup_rag fails (e.g. the embedding API is unreachable
+    while syncing): serve the database already on disk as-is
+    """
+    if not vector_store_exists():
+        print(f"❌ Could not build the vector database: {error}")
+        raise RuntimeError(f"Vector database setup failed and no existing database to fall back on: {error}") from error
+    
+    print(f"⚠️ Error updating the vector database: {error}")
+    print("✅ Loading existing vector database as-is...")
+    try:
+        return load_vector_store()
+    except Exception as e:
+        print(f"❌ Could not load the existing vector database either: {e}")
+        raise RuntimeError(f"Vector database setup failed ({error}) and loading the existing one failed: {e}") from e
+
+async def aget_vectorstore():
+    """
+    Async get_vectorstore: loading is blocking work, so it runs in a worker
+    thread; once loaded the store is returned directly
+    """
+    if _vectorstore is not None:
+        return _vectorstore
+    return await asyncio.to_thread(get_vectorstore)
+
+def get_loaded_index_version():
+    """
+    Version of the loaded index (None until the store is loaded)
+    """
+    return _index_version
+
+def is_ready():
+    """
+    True once the vector store is loaded
+    """
+    return _vectorstore is not None
+
+def warmup(query=WARMUP_QUERY):
+    """
+    Load the vector store and run one search so the first real request
+    doesn't pay for it (index files paged in, local indexes built,
+    embedding client connected). Call it at startup, before serving
+    requests or analyzing claims concurrently.
+    
+    Args:
+        query: Dummy search query
+    
+    Returns:
+        Dict with ready, chunks, index_version, load_seconds and query_seconds
+    """
+    start = time.perf_counter()
+    vectorstore = get_vectorstore()
+    loaded = time.perf_counter()
+    
+    # Not stored in the query or semantic caches: it only primes the path
+    search_directive(query, vectorstore, k=SEARCH_K, use_semantic_cache=False)
+    searched = time.perf_counter()
+    
+    status = {
+        "ready": True,
+        "chunks": len(get_bm25_index(vectorstore)),
+        "index_version": _index_version,
+        "load_seconds": loaded - start,
+        "query_seconds": searched - loaded,
+    }
+    print(f"🔥 Warmed up in {searched - start:.2f}s (load {status['load_seconds']:.2f}s, first search {status['query_seconds']:.2f}s)")
+    return status
+
 @tool
 def search_eu_directive(query: str) -> str:
     """
@@ -60,18 +149,66 @@ def search_eu_directive(query: str) -> str:
     # Get vector store (lazy load)
     vectorstore = get_vectorstore()
     
-    # Search the directive
-    results = search_directive(query, vectorstore, k=5)
-    
-    # Format results into readable text
-    formatted_results = []
-    for i, doc in enumerate(results, 1):
-        page = doc.metadata.get('page', 'Unknown')
-        article = doc.metadata.get('article', 'Unknown Article')
-        content = doc.page_content
-        formatted_results.append(
-            f"[Result {i} - {article} - Page {page}]\n{content}\n"
-        )
-    
-    # Join all results with separators
-    return "\n" + "="*50 + "\n".join(formatted_results)
\ No newline at end of file
+    # Repeated queries (any casing/spacing) are served from the cache
+    key = query_cache_key(query, SEARCH_K, _index_version)
+    results = cached_results(key)
+    
+    if results is None:
+        start = time.perf_counter()
+        
+        # Search the directive
+        results = search_directive(query, vectorstore, k=SEARCH_K)
+        
+        cache_results(key, results, cost=time.perf_counter() - start)
+    
+    # Skip chunks this agent already saw and trim to the context budget
+    return current_assembler().assemble(query, results)
+
+async def asearch_eu_directive(query: str) -> str:
+    """
+    Async implementation of search_eu_directive, used when agents run via ainvoke
+    """
+    # Loading the store is blocking work, so keep it off the event loop
+    vectorstore = await aget_vectorstore()
+    
+    key = query_cache_key(query, SEARCH_K, _index_version)
+    results = _from_cache_value(await _query_cache.aget(key))
+    
+    if results is None:
+        start = time.perf_counter()
+        results = await asearch_directive(query, vectorstore, k=SEARCH_K)
+        await _query_cache.aput(key, _to_cache_value(results), cost=time.perf_counter() - start)
+    
+    return current_assembler().assemble(query, results)
+
+# Agents invoked with ainvoke call the tool's coroutine instead of the sync function
+search_eu_directive.coroutine = asearch_eu_directive
+
+def cache_results(key, results, cost):
+    """
+    Store search results (as JSON, so the on-disk tier can hold them too)
+    """
+    _query_cache.put(key, _to_cache_value(results), cost=cost)
+
+def cached_results(key):
+    """
+    Cached search results for a key, or None on a miss
+    """
+    return _from_cache_value(_query_cache.get(key))
+
+def _to_cache_value(results):
+    return json.dumps([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in results])
+
+def _from_cache_value(value):
+    if value is None:
+        return None
+    try:
+        return [Document(**item) for item in json.loads(value)]
+    except (ValueError, TypeError):
+        return None  # Entry written in an older format
+
+def get_query_cache_stats():
+    """
+    Query cache metrics: hits, misses, hit rate and seconds of search time saved
+    """
+    return _query_cache.stats()